@@ -0,0 +1,199 @@
+import re
+
+DEFAULT_STRIP_TOKENS = ["超高清", "高清", "标清", " "]
+DEFAULT_GROUP_TITLE = "其他频道"
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick 自动机：一次扫描名称，返回命中的优先级最高的关键字
+    每个关键字携带一个排序键 (priority, index)，键越小优先级越高
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]
+
+    def add(self, keyword: str, key: tuple):
+        state = 0
+        for ch in keyword:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.best.append(None)
+                self.goto[state][ch] = nxt
+            state = nxt
+        if self.best[state] is None or key < self.best[state]:
+            self.best[state] = key
+
+    def build(self):
+        queue = list(self.goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                inherited = self.best[self.fail[nxt]]
+                if inherited is not None and (
+                    self.best[nxt] is None or inherited < self.best[nxt]
+                ):
+                    self.best[nxt] = inherited
+
+    def search(self, text: str):
+        """
+        :param text: 待匹配的名称
+        :return: 命中关键字中最小的排序键，未命中返回 None
+        """
+        goto, fail, best = self.goto, self.fail, self.best
+        state = 0
+        found = None
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            key = best[state]
+            if key is not None and (found is None or key < found):
+                found = key
+        return found
+
+
+class ChannelRules:
+    """
+    编译后的频道名称规范化与分组规则
+
+    规则来源（按顺序编号，priority 相同时编号小者优先）:
+    - group_title_rules: [{"keyword" | "regex": ..., "group_title": ..., "priority": 可选}]
+    - group_title_map_by_channel_name_keywords: {关键字: 分组}
+    未显式指定 priority 的规则以其编号作为 priority
+    """
+
+    def __init__(self, cfg: dict):
+        self.tvg_name_map_by_tvg_id = cfg.get("tvg_name_map_by_tvg_id", {})
+        self.tvg_name_map_by_tvg_name = cfg.get("tvg_name_map_by_tvg_name", {})
+        self.channel_name_map_by_tvg_id = cfg.get("channel_name_map_by_tvg_id", {})
+        self.default_group_title = cfg.get("default_group_title", DEFAULT_GROUP_TITLE)
+
+        tokens = cfg.get("tvg_name_strip_tokens", DEFAULT_STRIP_TOKENS)
+        tokens = sorted((t for t in tokens if t), key=len, reverse=True)
+        self.strip_pattern = (
+            re.compile("|".join(re.escape(t) for t in tokens)) if tokens else None
+        )
+
+        self.rules = []
+        for rule in cfg.get("group_title_rules", []):
+            if "regex" in rule:
+                self._add_rule("regex", rule["regex"], rule)
+            elif "keyword" in rule:
+                self._add_rule("keyword", rule["keyword"], rule)
+            else:
+                raise ValueError(f"[Formatter] Invalid group_title rule: {rule}")
+        for keyword, title in cfg.get(
+            "group_title_map_by_channel_name_keywords", {}
+        ).items():
+            self._add_rule("keyword", keyword, {"group_title": title})
+
+        self.automaton = KeywordAutomaton()
+        self.regex_rules = []
+        for rule in self.rules:
+            key = (rule["priority"], rule["index"])
+            if rule["kind"] == "keyword":
+                self.automaton.add(rule["pattern"], key)
+            else:
+                self.regex_rules.append((key, re.compile(rule["pattern"]), rule))
+        self.automaton.build()
+        self.regex_rules.sort(key=lambda x: x[0])
+
+    def _add_rule(self, kind: str, pattern: str, rule: dict):
+        index = len(self.rules)
+        self.rules.append(
+            {
+                "index": index,
+                "kind": kind,
+                "pattern": pattern,
+                "group_title": rule["group_title"],
+                "priority": rule.get("priority", index),
+            }
+        )
+
+    def normalize(self, name: str) -> str:
+        if self.strip_pattern is None:
+            return name
+        return self.strip_pattern.sub("", name)
+
+    def match_group(self, channel_name: str):
+        """
+        :param channel_name: 频道名称
+        :return: 命中的规则 dict，未命中返回 None
+        """
+        best = self.automaton.search(channel_name)
+        for key, regex, rule in self.regex_rules:
+            if best is not None and key >= best:
+                break
+            if regex.search(channel_name):
+                return rule
+        return self.rules[best[1]] if best is not None else None
+
+    def apply(self, channel_name: str, tvg_id: str):
+        """
+        :return: (ChannelName, tvg_name, group_title)
+        """
+        tvg_name = self.normalize(channel_name)
+        tvg_name = self.tvg_name_map_by_tvg_id.get(tvg_id, tvg_name)
+        tvg_name = self.tvg_name_map_by_tvg_name.get(tvg_name, tvg_name)
+
+        channel_name = self.channel_name_map_by_tvg_id.get(tvg_id, channel_name)
+
+        rule = self.match_group(channel_name)
+        group_title = rule["group_title"] if rule else self.default_group_title
+        return channel_name, tvg_name, group_title
+
+    def explain(self, channel_name: str, tvg_id: str = "") -> list[str]:
+        """
+        逐步说明一个频道名称经过了哪些规则
+        """
+        lines = [f"input: ChannelName={channel_name!r} tvg_id={tvg_id!r}"]
+
+        tvg_name = self.normalize(channel_name)
+        lines.append(f"normalize: tvg_name={tvg_name!r}")
+        if tvg_id in self.tvg_name_map_by_tvg_id:
+            tvg_name = self.tvg_name_map_by_tvg_id[tvg_id]
+            lines.append(f"tvg_name_map_by_tvg_id[{tvg_id!r}]: tvg_name={tvg_name!r}")
+        if tvg_name in self.tvg_name_map_by_tvg_name:
+            lines.append(
+                f"tvg_name_map_by_tvg_name[{tvg_name!r}]: "
+                f"tvg_name={self.tvg_name_map_by_tvg_name[tvg_name]!r}"
+            )
+
+        if tvg_id in self.channel_name_map_by_tvg_id:
+            channel_name = self.channel_name_map_by_tvg_id[tvg_id]
+            lines.append(
+                f"channel_name_map_by_tvg_id[{tvg_id!r}]: ChannelName={channel_name!r}"
+            )
+
+        candidates = []
+        for rule in self.rules:
+            if rule["kind"] == "keyword":
+                hit = rule["pattern"] in channel_name
+            else:
+                hit = re.search(rule["pattern"], channel_name) is not None
+            if hit:
+                candidates.append(rule)
+        candidates.sort(key=lambda r: (r["priority"], r["index"]))
+
+        for i, rule in enumerate(candidates):
+            mark = "*" if i == 0 else " "
+            lines.append(
+                f"{mark} rule #{rule['index']} {rule['kind']}={rule['pattern']!r} "
+                f"priority={rule['priority']} -> {rule['group_title']}"
+            )
+        if not candidates:
+            lines.append(f"no rule matched -> {self.default_group_title}")
+        return lines
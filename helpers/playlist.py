@@ -31,3 +31,20 @@ def replace_third_ip_byte(url: str, new_byte: int) -> str:
         new_url += f":{port}"
 
     return new_url
+
+
+def set_url_query_param(url: str, key: str, value: str) -> str:
+    """
+    设置 URL 中的查询参数，已存在则替换，不存在则追加
+
+    :param url: 例如 "http://192.168.0.1:5140/{}?fcc=124.132.240.66:15970"
+    :param key: 参数名，例如 "fcc"
+    :param value: 新的参数值
+    :return: 替换后的 URL
+    """
+    import re
+
+    pattern = rf"([?&]){re.escape(key)}=[^&]*"
+    if re.search(pattern, url):
+        return re.sub(pattern, lambda m: f"{m.group(1)}{key}={value}", url, count=1)
+    return f"{url}{'&' if '?' in url else '?'}{key}={value}"
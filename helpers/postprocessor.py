@@ -49,3 +49,66 @@ def test_ip_connectivity(url, start=1, end=254):
             return last_octet
 
     return None
+
+
+PLAYBACK_HOST_OCTETS = list(range(36, 49)) + list(range(68, 75))
+
+
+def probe_playback_hosts(url, test=test_ffmpeg_rtsp, order=None):
+    """
+    先测试原地址，不可用时在常用区间内扫描回看服务器（跳过已测过的原地址）
+    test: 单个地址的探测函数；order: 调整/筛选待扫描 IP 最后一段的函数 (url, octets) -> octets
+    返回 (原地址是否可用, 可用的 IP 最后一段或 None)
+    """
+    if test(url):
+        return True, None
+    parsed = urlparse(url)
+    ip_parts = parsed.hostname.split(".")
+    octets = [o for o in PLAYBACK_HOST_OCTETS if str(o) != ip_parts[-1]]
+    if order:
+        octets = order(url, octets)
+    for last_octet in octets:
+        ip_parts[-1] = str(last_octet)
+        if test(url.replace(parsed.hostname, ".".join(ip_parts))):
+            return False, last_octet
+    return False, None
+
+
+def search_max_true(lo, hi, predicate):
+    """
+    在 [lo, hi] 内二分查找 predicate 为 True 的最大整数（要求单调：小值成立则更小值也成立）
+    假定 predicate(lo) 已知成立，不再探测 lo
+    返回 (最大成立值, 探测次数)
+    """
+    probes = 0
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        probes += 1
+        if predicate(mid):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo, probes
+
+
+def wilson_interval(successes, total, z=1.96):
+    """
+    二项比例的 Wilson 置信区间，返回 (下界, 上界)
+    """
+    if total == 0:
+        return 0.0, 1.0
+    p = successes / total
+    denom = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denom
+    margin = z * ((p * (1 - p) / total + z * z / (4 * total * total)) ** 0.5) / denom
+    return center - margin, center + margin
+
+
+def wilson_samples_needed(threshold=0.5, z=1.96):
+    """
+    样本全部一致时，Wilson 区间越过 threshold 所需的最少样本数
+    """
+    n = 1
+    while wilson_interval(n, n, z)[0] <= threshold:
+        n += 1
+    return n
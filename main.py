@@ -1,10 +1,11 @@
-import argparse
+import argparse, sys
 from pathlib import Path
 from modules.config import Config
 from modules.generator import M3UPlaylistGenerator
 from modules.scraper import Scraper
 from modules.formatter import Formatter
 from modules.postprocessor import PostProcessor
+from modules.epg import EPGSlicer
 
 CONFIG_PATH = "config"
 
@@ -21,12 +22,56 @@ def fetch():
     client.run()
 
 
+def fetch_epg():
+    from modules.epg import PortalEPGScraper
+
+    client = Scraper(cfg=cfg.get_scraper_config(), common_config=common_config)
+    client.login()
+    client.auth()
+    client.portal_auth()
+    PortalEPGScraper(
+        cfg=cfg.get_epg_config(), common_config=common_config, scraper=client
+    ).run()
+
+
 def format():
     formatter_config = cfg.formatter
     formatter = Formatter(cfg=formatter_config, common_config=common_config)
     formatter.run()
 
 
+def explain(name, tvg_id):
+    formatter_config = cfg.formatter
+    formatter = Formatter(cfg=formatter_config, common_config=common_config)
+    formatter.explain(name, tvg_id)
+
+
+def bench(target, rules, names, channels):
+    from utils.bench import bench_rules, bench_channels
+
+    if target == "rules":
+        bench_rules(n_rules=rules, n_names=names)
+    elif target == "channels":
+        bench_channels(n_channels=channels)
+
+
+def convert(file, to):
+    data_dir = Path(common_config.get("data_dir"))
+    if file == "raw":
+        from utils.ndjson import iter_records, write_records
+
+        if to == "compact":
+            raise ValueError("[Convert] raw data has no compact layout.")
+        path = data_dir / common_config.get("raw_file_name")
+        write_records(path, list(iter_records(path)), ndjson=to == "ndjson", indent=4)
+    else:
+        from modules.channel import load_channels, save_channels
+
+        path = data_dir / common_config.get("formatted_file_name")
+        save_channels(path, load_channels(path), fmt=to)
+    print(f"[Convert] {path} converted to {to}.")
+
+
 def generate(mode, area, filter):
     generator_config = cfg.get_generator_config()
     area_codes = cfg.get_area_codes()
@@ -36,6 +81,28 @@ def generate(mode, area, filter):
     generator.generate_playlist(mode=mode, area=area, filter=filter)
 
 
+def slice_epg(mode, filter):
+    generator_config = cfg.get_generator_config()
+    area_codes = cfg.get_area_codes()
+    generator = M3UPlaylistGenerator(
+        cfg=generator_config, common_config=common_config, area_codes=area_codes
+    )
+    slicer = EPGSlicer(cfg=cfg.get_epg_config(), common_config=common_config)
+    generator.generate_epg(slicer, mode=mode, filter=filter)
+
+
+def select_fcc(area, force):
+    from modules.fcc import FccSelector
+
+    selector = FccSelector(
+        cfg=cfg.get_fcc_config(),
+        common_config=common_config,
+        generator_config=cfg.get_generator_config(),
+        area_codes=cfg.get_area_codes(),
+    )
+    selector.run(areas=[area] if area else None, force=force)
+
+
 def generate_table():
     generator_config = cfg.get_generator_config()
     area_codes = cfg.get_area_codes()
@@ -62,6 +129,76 @@ def playback():
     post_processor.process_playback()
 
 
+def health():
+    post_processor_config = cfg.get_post_processor_config()
+    post_processor = PostProcessor(
+        cfg=post_processor_config, common_config=common_config
+    )
+    post_processor.check_hosts()
+
+
+def catchup():
+    post_processor_config = cfg.get_post_processor_config()
+    post_processor = PostProcessor(
+        cfg=post_processor_config, common_config=common_config
+    )
+    post_processor.process_catchup_depth()
+
+
+def coordinator(stage):
+    from modules.cluster import Coordinator
+
+    coord = Coordinator(cfg.get_cluster_config()).start()
+    try:
+        if stage in ("format", "all"):
+            formatter = Formatter(cfg=cfg.formatter, common_config=common_config)
+            formatter.resolve_redirect = lambda url, **kwargs: coord.call(
+                "redirect", {"url": url, **kwargs}
+            )
+            formatter.test_stream = lambda url: bool(
+                coord.call("stream", {"url": url})
+            )
+            formatter.run()
+        if stage in ("playback", "all"):
+            post_processor = PostProcessor(
+                cfg=cfg.get_post_processor_config(), common_config=common_config
+            )
+            post_processor.probe_playback = lambda url: tuple(
+                coord.call("playback", {"url": url}) or (False, None)
+            )
+            post_processor.process_playback()
+    finally:
+        coord.stop()
+
+
+def worker(url, name):
+    from modules.cluster import Worker
+
+    Worker(cfg.get_cluster_config(), url=url, name=name).run()
+
+
+def relay():
+    import asyncio
+    from modules.relay import MulticastRelay
+
+    try:
+        asyncio.run(MulticastRelay(cfg.get_relay_config()).serve_forever())
+    except KeyboardInterrupt:
+        print("[Relay] Stopped.")
+
+
+def gateway():
+    import asyncio
+    from modules.gateway import RtspGateway
+
+    try:
+        asyncio.run(
+            RtspGateway(cfg.get_gateway_config(), common_config).serve_forever()
+        )
+    except KeyboardInterrupt:
+        print("[Gateway] Stopped.")
+
+
 def diff():
     post_processor_config = cfg.get_post_processor_config()
     post_processor = PostProcessor(
@@ -70,12 +207,17 @@ def diff():
     post_processor.diff()
 
 
-def auth():
+def auth(sample):
     post_processor_config = cfg.get_post_processor_config()
     post_processor = PostProcessor(
         cfg=post_processor_config, common_config=common_config
     )
-    post_processor.if_auth()
+    from helpers.formatter import ChannelRules
+
+    verdict = post_processor.if_auth(
+        sample=sample, rules=ChannelRules(cfg.formatter)
+    )
+    sys.exit({False: 0, True: 1, None: 2}[verdict])
 
 
 def process_all():
@@ -90,13 +232,52 @@ def main():
     subparsers = parser.add_subparsers(dest="command")
 
     subparsers.add_parser("fetch", help="Fetch raw data")
+    subparsers.add_parser(
+        "fetch_epg", help="Fetch programme guides from the operator portal"
+    )
     subparsers.add_parser("format", help="Format raw data")
 
+    explain_parser = subparsers.add_parser(
+        "explain", help="Explain which formatter rules match a channel"
+    )
+    explain_parser.add_argument("--name", type=str, required=True)
+    explain_parser.add_argument("--tvg-id", type=str, default="")
+
+    convert_parser = subparsers.add_parser(
+        "convert", help="Convert raw/formatted data between JSON and NDJSON"
+    )
+    convert_parser.add_argument(
+        "--file", type=str, choices=["raw", "formatted"], required=True
+    )
+    convert_parser.add_argument(
+        "--to", type=str, choices=["json", "ndjson", "compact"], required=True
+    )
+
+    bench_parser = subparsers.add_parser("bench", help="Run a benchmark")
+    bench_parser.add_argument(
+        "--target", type=str, choices=["rules", "channels"], default="rules"
+    )
+    bench_parser.add_argument("--rules", type=int, default=10_000)
+    bench_parser.add_argument("--names", type=int, default=100_000)
+    bench_parser.add_argument("--channels", type=int, default=100_000)
+
     generate_parser = subparsers.add_parser("generate", help="Generate M3U playlist")
     generate_parser.add_argument("--mode", type=str, default="private")
     generate_parser.add_argument("--area", type=str, required=True)
     generate_parser.add_argument("--filter", type=bool, default=True)
 
+    epg_parser = subparsers.add_parser(
+        "slice_epg", help="Trim the XMLTV guide to the channels in a playlist"
+    )
+    epg_parser.add_argument("--mode", type=str, default="private")
+    epg_parser.add_argument("--filter", type=bool, default=True)
+
+    fcc_parser = subparsers.add_parser(
+        "select_fcc", help="Measure FCC servers and pick the best per area"
+    )
+    fcc_parser.add_argument("--area", type=str, default="")
+    fcc_parser.add_argument("--force", action="store_true")
+
     subparsers.add_parser("generate_table", help="Generate channel table")
 
     unused_parser = subparsers.add_parser(
@@ -105,8 +286,26 @@ def main():
     unused_parser.add_argument("--area", type=str, required=True)
 
     subparsers.add_parser("playback", help="Process playback data")
+    subparsers.add_parser("health", help="Re-probe unicast edge hosts")
+    subparsers.add_parser("catchup", help="Search catchup depth per channel")
+    coordinator_parser = subparsers.add_parser(
+        "coordinator", help="Distribute probes to remote workers"
+    )
+    coordinator_parser.add_argument(
+        "--stage", type=str, choices=["format", "playback", "all"], default="all"
+    )
+
+    worker_parser = subparsers.add_parser("worker", help="Run probes for a coordinator")
+    worker_parser.add_argument("--url", type=str, required=True)
+    worker_parser.add_argument("--name", type=str, default=None)
+
+    subparsers.add_parser("relay", help="Serve multicast streams over HTTP")
+    subparsers.add_parser("gateway", help="Restream unicast RTSP channels over HTTP")
     subparsers.add_parser("diff", help="Perform diff operation")
-    subparsers.add_parser("check", help="Check if auth is required")
+    check_parser = subparsers.add_parser("check", help="Check if auth is required")
+    check_parser.add_argument(
+        "--sample", type=str, choices=["stratified", "all"], default=None
+    )
 
     subparsers.add_parser("all", help="Run fetch, format and generate in sequence")
 
@@ -114,20 +313,44 @@ def main():
 
     if args.command == "fetch":
         fetch()
+    elif args.command == "fetch_epg":
+        fetch_epg()
     elif args.command == "format":
         format()
+    elif args.command == "explain":
+        explain(args.name, args.tvg_id)
+    elif args.command == "convert":
+        convert(args.file, args.to)
+    elif args.command == "bench":
+        bench(args.target, args.rules, args.names, args.channels)
     elif args.command == "generate":
         generate(args.mode, args.area, args.filter)
+    elif args.command == "slice_epg":
+        slice_epg(args.mode, args.filter)
+    elif args.command == "select_fcc":
+        select_fcc(args.area, args.force)
     elif args.command == "generate_table":
         generate_table()
     elif args.command == "generate_unused":
         generate_unused(args.area)
     elif args.command == "playback":
         playback()
+    elif args.command == "health":
+        health()
+    elif args.command == "catchup":
+        catchup()
+    elif args.command == "coordinator":
+        coordinator(args.stage)
+    elif args.command == "worker":
+        worker(args.url, args.name)
+    elif args.command == "relay":
+        relay()
+    elif args.command == "gateway":
+        gateway()
     elif args.command == "diff":
         diff()
     elif args.command == "check":
-        auth()
+        auth(args.sample)
 
     elif args.command == "all":
         process_all()
@@ -0,0 +1,202 @@
+import json, socket, struct, sys
+from operator import attrgetter
+from typing import Optional
+from utils.ndjson import iter_records
+from utils.output import write_if_changed
+
+
+class Channel:
+    """Formatted channel record, serialized as one object of iptv.json."""
+
+    FIELDS = (
+        "ChannelID",
+        "ChannelName",
+        "tvg_id",
+        "tvg_name",
+        "group_title",
+        "mul_live",
+        "uni_live",
+        "uni_playback",
+    )
+    OPTIONAL_FIELDS = ("alternate_hosts", "catchup_days", "catchup_hours", "probed_at")
+
+    __slots__ = FIELDS + OPTIONAL_FIELDS + ("mul_addr", "mul_port", "extra")
+
+    def __init__(
+        self,
+        ChannelID: str = "",
+        ChannelName: str = "",
+        tvg_id: str = "",
+        tvg_name: str = "",
+        group_title: str = "",
+        mul_live: str = "",
+        uni_live: str = "",
+        uni_playback: str = "",
+        alternate_hosts: Optional[list] = None,
+        catchup_days: Optional[int] = None,
+        catchup_hours: Optional[int] = None,
+        probed_at: Optional[dict] = None,
+        extra: Optional[dict] = None,
+    ):
+        self.ChannelID = _intern(ChannelID)
+        self.ChannelName = _intern(ChannelName)
+        self.tvg_id = _intern(tvg_id)
+        self.tvg_name = _intern(tvg_name)
+        self.group_title = _intern(group_title)
+        self.uni_live = uni_live
+        self.uni_playback = uni_playback
+        self.alternate_hosts = alternate_hosts
+        self.catchup_days = catchup_days
+        self.catchup_hours = catchup_hours
+        self.probed_at = probed_at
+        self.extra = extra
+        self.set_mul_live(mul_live)
+
+    def set_mul_live(self, mul_live: str):
+        self.mul_live = mul_live
+        self.mul_addr, self.mul_port = parse_rtp_address(mul_live)
+
+    def mul_path(self, area_code: Optional[int] = None) -> str:
+        """'rtp/<group>:<port>' for udpxy, optionally with the area's third byte."""
+        if self.mul_addr is None:
+            return ""
+        addr = self.mul_addr
+        if area_code is not None:
+            addr = (addr & 0xFFFF00FF) | (area_code << 8)
+        return f"rtp/{socket.inet_ntoa(struct.pack('!I', addr))}:{self.mul_port}"
+
+    @property
+    def mul_number(self) -> str:
+        return str(self.mul_addr & 0xFF) if self.mul_addr is not None else ""
+
+    def copy(self) -> "Channel":
+        ch = Channel.__new__(Channel)
+        for name in Channel.__slots__:
+            setattr(ch, name, getattr(self, name))
+        return ch
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Channel":
+        known = {k: d[k] for k in cls.FIELDS + cls.OPTIONAL_FIELDS if k in d}
+        extra = {k: v for k, v in d.items() if k not in known} or None
+        return cls(extra=extra, **known)
+
+    def to_dict(self) -> dict:
+        d = {name: getattr(self, name) for name in self.FIELDS}
+        for name in self.OPTIONAL_FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                d[name] = value
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+    def set_field(self, name: str, value):
+        if name in Channel.__slots__:
+            setattr(self, name, value)
+        elif value is not None:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[name] = value
+
+    def get_field(self, name: str):
+        if name in Channel.__slots__:
+            return getattr(self, name)
+        return self.extra.get(name) if self.extra else None
+
+
+_core_fields = attrgetter(*Channel.FIELDS)
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def parse_rtp_address(url: str):
+    """'rtp://239.253.240.77:8000' -> (int address, port); (None, None) if not parseable."""
+    if not url:
+        return None, None
+    rest = url.split("://", 1)[-1]
+    host, _, port = rest.partition(":")
+    try:
+        addr = int.from_bytes(socket.inet_aton(host), "big")
+        return addr, int(port.split("/", 1)[0]) if port else None
+    except (OSError, ValueError):
+        return None, None
+
+
+def _row_fields(channels: list) -> list:
+    fields = list(Channel.FIELDS)
+    seen = set(fields)
+    for ch in channels:
+        for name in Channel.OPTIONAL_FIELDS:
+            if name not in seen and getattr(ch, name) is not None:
+                fields.append(name)
+                seen.add(name)
+        for name in ch.extra or ():
+            if name not in seen:
+                fields.append(name)
+                seen.add(name)
+    return fields
+
+
+def iter_channels(path):
+    """Lazily read iptv.json in the classic array, compact or NDJSON layout."""
+    for record in iter_records(path):
+        if "fields" in record and "rows" in record:
+            yield from channels_from_rows(record["fields"], record["rows"])
+        else:
+            yield Channel.from_dict(record)
+
+
+def load_channels(path) -> list:
+    return list(iter_channels(path))
+
+
+def channels_from_rows(fields: list, rows: list) -> list:
+    n = len(Channel.FIELDS)
+    if tuple(fields[:n]) != Channel.FIELDS:
+        return [Channel.from_dict(dict(zip(fields, row))) for row in rows]
+    rest = list(enumerate(fields[n:], n))
+    channels = []
+    for row in rows:
+        ch = Channel(*row[:n])
+        for i, name in rest:
+            ch.set_field(name, row[i])
+        channels.append(ch)
+    return channels
+
+
+def channels_to_rows(channels: list):
+    fields = _row_fields(channels)
+    rest = fields[len(Channel.FIELDS) :]
+    if not rest:
+        return fields, [_core_fields(ch) for ch in channels]
+    return fields, [
+        _core_fields(ch) + tuple(ch.get_field(name) for name in rest)
+        for ch in channels
+    ]
+
+
+def render_channels(channels: list, fmt: str = "json") -> str:
+    """
+    fmt="json" renders the classic iptv.json layout (array of objects, indent=2);
+    fmt="compact" renders {"fields": [...], "rows": [[...], ...]} without whitespace;
+    fmt="ndjson" renders one object per line.
+    """
+    if fmt == "compact":
+        fields, rows = channels_to_rows(channels)
+        return json.dumps(
+            {"fields": fields, "rows": rows}, ensure_ascii=False, separators=(",", ":")
+        )
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps(ch.to_dict(), ensure_ascii=False, separators=(",", ":")) + "\n"
+            for ch in channels
+        )
+    return json.dumps([ch.to_dict() for ch in channels], ensure_ascii=False, indent=2)
+
+
+def save_channels(path, channels: list, fmt: str = "json") -> bool:
+    """Write iptv.json only if its content changed; returns whether it was rewritten."""
+    return write_if_changed(path, render_channels(channels, fmt))
@@ -0,0 +1,299 @@
+import json, hmac, socket, threading, time, uuid, requests
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+def run_probe(kind: str, payload: dict):
+    if kind == "redirect":
+        from utils.ffmpeg import get_redirected_rtsp_url
+
+        return get_redirected_rtsp_url(
+            payload["url"],
+            retries=payload.get("retries", 5),
+            delay=payload.get("delay", 1),
+            timeout=payload.get("timeout", 5),
+        )
+    if kind == "playback":
+        from helpers.postprocessor import probe_playback_hosts
+
+        return probe_playback_hosts(payload["url"])
+    if kind == "stream":
+        from helpers.postprocessor import test_ffmpeg_rtsp
+
+        return test_ffmpeg_rtsp(payload["url"])
+    raise ValueError(f"[Cluster] Unknown task kind: {kind}")
+
+
+class Coordinator:
+    def __init__(self, cfg: dict):
+        self.host = cfg.get("host", "0.0.0.0")
+        self.port = cfg.get("port", 8765)
+        self.token = cfg.get("token", "")
+        self.lease_seconds = cfg.get("lease_seconds", 60)
+        self.max_attempts = cfg.get("max_attempts", 3)
+        self.call_timeout = cfg.get("call_timeout", 900)
+
+        self.pending = deque()
+        self.leased: dict[str, tuple] = {}
+        self.futures: dict[str, Future] = {}
+        self.tasks: dict[str, dict] = {}
+        self.workers: dict[str, dict] = {}
+        self.done = False
+        self._cond = threading.Condition()
+        self.server = None
+
+    def start(self):
+        if not self.token:
+            raise ValueError("[Cluster] 'token' must be configured.")
+        coordinator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                coordinator._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._reap_expired, daemon=True).start()
+        print(f"[Cluster] Coordinator listening on {self.host}:{self.port}.")
+        return self
+
+    def stop(self, grace: float = 3):
+        with self._cond:
+            self.done = True
+        time.sleep(grace)
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        self.report()
+
+    def call(self, kind: str, payload: dict, timeout: Optional[float] = None):
+        """
+        Queue a probe for the workers and block until its result arrives.
+        Returns None if no result arrives within timeout (call_timeout by default).
+        """
+        task_id = uuid.uuid4().hex
+        future = Future()
+        with self._cond:
+            self.tasks[task_id] = {
+                "id": task_id,
+                "kind": kind,
+                "payload": payload,
+                "attempts": 0,
+            }
+            self.futures[task_id] = future
+            self.pending.append(task_id)
+            self._cond.notify_all()
+        try:
+            return future.result(timeout=timeout or self.call_timeout)
+        except FuturesTimeoutError:
+            with self._cond:
+                if task_id in self.tasks:
+                    print(f"[Cluster] Task {task_id} ({kind}) timed out.")
+                    if task_id in self.pending:
+                        self.pending.remove(task_id)
+                    self.leased.pop(task_id, None)
+                    self._resolve(task_id, None)
+            return future.result()
+
+    def _lease(self, worker: str, max_tasks: int) -> list[dict]:
+        deadline = time.monotonic() + self.lease_seconds
+        leased = []
+        with self._cond:
+            while self.pending and len(leased) < max_tasks:
+                task = self.tasks[self.pending.popleft()]
+                task["attempts"] += 1
+                self.leased[task["id"]] = (worker, deadline)
+                leased.append(
+                    {"id": task["id"], "kind": task["kind"], "payload": task["payload"]}
+                )
+        return leased
+
+    def _renew(self, worker: str, task_ids: list) -> int:
+        deadline = time.monotonic() + self.lease_seconds
+        renewed = 0
+        with self._cond:
+            for task_id in task_ids:
+                lease = self.leased.get(task_id)
+                if lease is not None and lease[0] == worker:
+                    self.leased[task_id] = (worker, deadline)
+                    renewed += 1
+        return renewed
+
+    def _complete(self, worker: str, task_id: str, result, error: Optional[str]):
+        with self._cond:
+            if task_id not in self.leased:
+                return
+            self.leased.pop(task_id)
+            stats = self.workers.setdefault(worker, {"done": 0, "failed": 0})
+            if error is None:
+                stats["done"] += 1
+                self._resolve(task_id, result)
+            else:
+                stats["failed"] += 1
+                self._retry_or_fail(task_id)
+
+    def _retry_or_fail(self, task_id: str):
+        if self.tasks[task_id]["attempts"] < self.max_attempts:
+            self.pending.append(task_id)
+        else:
+            self._resolve(task_id, None)
+
+    def _resolve(self, task_id: str, result):
+        self.tasks.pop(task_id)
+        self.futures.pop(task_id).set_result(result)
+
+    def _reap_expired(self):
+        while True:
+            time.sleep(1)
+            now = time.monotonic()
+            with self._cond:
+                expired = [t for t, (_, d) in self.leased.items() if d < now]
+                for task_id in expired:
+                    worker, _ = self.leased.pop(task_id)
+                    print(f"[Cluster] Lease of task {task_id} on {worker} expired.")
+                    self._retry_or_fail(task_id)
+
+    def _handle(self, request):
+        auth = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(auth, f"Bearer {self.token}"):
+            request.send_response(401)
+            request.end_headers()
+            return
+
+        length = int(request.headers.get("Content-Length", 0))
+        body = json.loads(request.rfile.read(length) or b"{}")
+        worker = body.get("worker", "?")
+
+        if request.path == "/lease":
+            reply = {
+                "tasks": self._lease(worker, body.get("max", 1)),
+                "done": self.done,
+                "lease_seconds": self.lease_seconds,
+            }
+        elif request.path == "/renew":
+            reply = {"renewed": self._renew(worker, body.get("ids", []))}
+        elif request.path == "/result":
+            for item in body.get("results", []):
+                self._complete(worker, item["id"], item.get("result"), item.get("error"))
+            reply = {"ok": True}
+        else:
+            request.send_response(404)
+            request.end_headers()
+            return
+
+        data = json.dumps(reply).encode("utf-8")
+        request.send_response(200)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    def report(self):
+        for worker, stats in sorted(self.workers.items()):
+            print(
+                f"- [Cluster] {worker}: {stats['done']} done, {stats['failed']} failed"
+            )
+
+
+class Worker:
+    """
+    Leases up to worker_threads tasks at a time, reports each result as soon as
+    it is ready and renews the leases of running tasks so long probes survive.
+    """
+
+    def __init__(self, cfg: dict, url: str, name: Optional[str] = None, probe=None):
+        self.url = url.rstrip("/")
+        self.token = cfg.get("token", "")
+        self.name = name or socket.gethostname()
+        self.workers = cfg.get("worker_threads", 4)
+        self.poll_interval = cfg.get("poll_interval", 1)
+        self.probe = probe or run_probe
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {self.token}"
+        self.running: set[str] = set()
+        self.lease_seconds = cfg.get("lease_seconds", 60)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _post(self, path: str, body: dict) -> dict:
+        body["worker"] = self.name
+        r = self.session.post(f"{self.url}{path}", json=body, timeout=10)
+        r.raise_for_status()
+        return r.json()
+
+    def _run_task(self, task: dict):
+        try:
+            result = self.probe(task["kind"], task["payload"])
+            item = {"id": task["id"], "result": result}
+        except Exception as e:
+            item = {"id": task["id"], "error": str(e)}
+        try:
+            self._post("/result", {"results": [item]})
+        except requests.exceptions.RequestException as e:
+            print(f"[Cluster] Failed to report result of {task['id']}: {e}")
+        finally:
+            with self._lock:
+                self.running.discard(task["id"])
+
+    def _renew_loop(self):
+        last = time.monotonic()
+        while not self._stop.wait(0.2):
+            if time.monotonic() - last < self.lease_seconds / 3:
+                continue
+            last = time.monotonic()
+            with self._lock:
+                ids = list(self.running)
+            if not ids:
+                continue
+            try:
+                self._post("/renew", {"ids": ids})
+            except requests.exceptions.RequestException as e:
+                print(f"[Cluster] Failed to renew leases: {e}")
+
+    def run(self, max_failures: int = 5):
+        failures = 0
+        print(f"[Cluster] Worker {self.name} polling {self.url}.")
+        threading.Thread(target=self._renew_loop, daemon=True).start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                while True:
+                    with self._lock:
+                        free = self.workers - len(self.running)
+                    if free <= 0:
+                        time.sleep(min(self.poll_interval, 0.2))
+                        continue
+                    try:
+                        reply = self._post("/lease", {"max": free})
+                        failures = 0
+                    except requests.exceptions.RequestException as e:
+                        failures += 1
+                        if failures >= max_failures:
+                            print(f"[Cluster] Coordinator unreachable: {e}")
+                            return
+                        time.sleep(self.poll_interval)
+                        continue
+
+                    self.lease_seconds = reply.get("lease_seconds", self.lease_seconds)
+                    tasks = reply.get("tasks", [])
+                    if not tasks:
+                        with self._lock:
+                            idle = not self.running
+                        if reply.get("done") and idle:
+                            print(f"[Cluster] Worker {self.name} finished.")
+                            return
+                        time.sleep(self.poll_interval)
+                        continue
+
+                    for task in tasks:
+                        with self._lock:
+                            self.running.add(task["id"])
+                        executor.submit(self._run_task, task)
+        finally:
+            self._stop.set()
@@ -12,6 +12,11 @@ class Config:
         self.formatter = self._load_json("formatter_config.json")
         self.post_processor_config = self._load_json("postprocessor_config.json")
         self.common_config = self._load_json("common_config.json")
+        self.epg_config = self._load_json("epg_config.json")
+        self.cluster_config = self._load_json("cluster_config.json")
+        self.relay_config = self._load_json("relay_config.json")
+        self.gateway_config = self._load_json("gateway_config.json")
+        self.fcc_config = self._load_json("fcc_config.json")
 
     def get_area_codes(self):
         return self.area_codes
@@ -31,6 +36,21 @@ class Config:
     def get_common_config(self):
         return self.common_config
 
+    def get_epg_config(self):
+        return self.epg_config
+
+    def get_cluster_config(self):
+        return self.cluster_config
+
+    def get_relay_config(self):
+        return self.relay_config
+
+    def get_gateway_config(self):
+        return self.gateway_config
+
+    def get_fcc_config(self):
+        return self.fcc_config
+
     def _load_json(self, filename: str):
         path = self.config_dir / filename
         try:
@@ -0,0 +1,280 @@
+import gzip, hashlib, json, os, requests
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from xml.sax.saxutils import quoteattr
+from datetime import datetime, timedelta, timezone
+from requests.adapters import HTTPAdapter
+from utils.convert import parse_xmltv_time
+from modules.channel import iter_channels
+
+
+class EPGSlicer:
+    def __init__(self, cfg: dict, common_config: dict):
+        self.playlist_dir = common_config.get("playlist_dir")
+        self.source_file_path = cfg.get("source_file_path", "")
+        self.window_hours_before = cfg.get("window_hours_before")
+        self.window_hours_after = cfg.get("window_hours_after")
+
+    def slice(self, tvg_names, output_file_name: str):
+        if not self.source_file_path or not Path(self.source_file_path).exists():
+            raise ValueError("[EPG] 'source_file_path' not found.")
+
+        wanted = set(tvg_names)
+        kept_ids = set()
+        window = self._window()
+        output_path = Path(self.playlist_dir) / output_file_name
+        tmp_path = output_path.with_name(output_path.name + ".tmp")
+        channel_count = programme_count = 0
+
+        with self._open_source() as src, gzip.open(tmp_path, "wb") as out:
+            context = ET.iterparse(src, events=("start", "end"))
+            _, root = next(context)
+            out.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+            out.write(self._open_tag(root))
+
+            for event, elem in context:
+                if event != "end" or elem.tag not in ("channel", "programme"):
+                    continue
+
+                if elem.tag == "channel":
+                    channel_id = elem.get("id", "")
+                    names = {d.text for d in elem.findall("display-name")}
+                    if channel_id in wanted or names & wanted:
+                        kept_ids.add(channel_id)
+                        out.write(ET.tostring(elem, encoding="utf-8"))
+                        channel_count += 1
+                elif elem.get("channel") in kept_ids and self._in_window(
+                    elem, window
+                ):
+                    out.write(ET.tostring(elem, encoding="utf-8"))
+                    programme_count += 1
+
+                elem.clear()
+                root.clear()
+
+            out.write(b"</tv>\n")
+
+        os.replace(tmp_path, output_path)
+        missing = len(wanted) - len(kept_ids)
+        print(
+            f"[EPG] {output_path}: {channel_count} channels, {programme_count} programmes"
+            f" ({missing} channels without guide data)."
+        )
+        return output_path
+
+    def _open_source(self):
+        if str(self.source_file_path).endswith(".gz"):
+            return gzip.open(self.source_file_path, "rb")
+        return open(self.source_file_path, "rb")
+
+    def _open_tag(self, root) -> bytes:
+        attrs = "".join(f" {k}={quoteattr(v)}" for k, v in root.attrib.items())
+        return f"<tv{attrs}>\n".encode("utf-8")
+
+    def _window(self):
+        now = datetime.now(tz=timezone.utc)
+        begin = (
+            now - timedelta(hours=self.window_hours_before)
+            if self.window_hours_before is not None
+            else None
+        )
+        end = (
+            now + timedelta(hours=self.window_hours_after)
+            if self.window_hours_after is not None
+            else None
+        )
+        return begin, end
+
+    def _in_window(self, elem, window) -> bool:
+        begin, end = window
+        if begin is None and end is None:
+            return True
+        start = parse_xmltv_time(elem.get("start", ""))
+        stop = parse_xmltv_time(elem.get("stop", "")) or start
+        if start is None:
+            return True
+        if begin is not None and stop < begin:
+            return False
+        if end is not None and start > end:
+            return False
+        return True
+
+
+
+class PortalEPGScraper:
+    """Build an XMLTV guide from the per-channel schedules on the operator portal."""
+
+    DEFAULT_FIELDS = {
+        "list": "data",
+        "title": "title",
+        "start": "start",
+        "stop": "end",
+        "time_format": "%Y%m%d%H%M%S",
+    }
+
+    def __init__(self, cfg: dict, common_config: dict, scraper):
+        self.scraper = scraper
+        self.data_dir = common_config.get("data_dir")
+        self.playlist_dir = common_config.get("playlist_dir")
+        self.formatted_file_path = Path(self.data_dir) / common_config.get(
+            "formatted_file_name"
+        )
+        self.cache_file_path = Path(self.data_dir) / cfg.get(
+            "portal_cache_file_name", "epg_portal_cache.json"
+        )
+        self.output_file_name = cfg.get("portal_output_file_name", "epg-portal.xml.gz")
+        self.schedule_path = cfg.get("portal_schedule_path", "")
+        self.fields = {**self.DEFAULT_FIELDS, **cfg.get("portal_fields", {})}
+        self.encoding = cfg.get("portal_encoding", "utf-8")
+        self.days_before = cfg.get("portal_days_before", 1)
+        self.days_after = cfg.get("portal_days_after", 2)
+        self.workers = cfg.get("portal_workers", 8)
+        self.timeout = cfg.get("portal_timeout", 5)
+        self.tz = timezone(timedelta(hours=8))
+
+    def run(self):
+        if not self.schedule_path:
+            raise ValueError("[EPG] 'portal_schedule_path' not configured.")
+
+        channels = {}
+        for ch in iter_channels(self.formatted_file_path):
+            if ch.tvg_name and ch.ChannelID:
+                channels.setdefault(ch.tvg_name, ch.ChannelID)
+
+        today = datetime.now(tz=self.tz).date()
+        days = [
+            (today + timedelta(days=d)).strftime("%Y%m%d")
+            for d in range(-self.days_before, self.days_after + 1)
+        ]
+        cache = self.load_cache()
+        cache = {
+            channel_id: {
+                day: cache[channel_id][day] for day in days if day in cache[channel_id]
+            }
+            for channel_id in channels.values()
+            if channel_id in cache
+        }
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.scraper.session.mount("http://", adapter)
+
+        jobs = []
+        for channel_id in channels.values():
+            for day in days:
+                cached = cache.get(channel_id, {}).get(day)
+                if cached is not None and day < today.strftime("%Y%m%d"):
+                    continue
+                jobs.append((channel_id, day, cached))
+
+        counts = {"changed": 0, "unchanged": 0, "failed": 0}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for channel_id, day, entry, status in executor.map(
+                lambda job: self.fetch_day(*job), jobs
+            ):
+                counts[status] += 1
+                if entry is not None:
+                    cache.setdefault(channel_id, {})[day] = entry
+
+        self.save_cache(cache)
+        output_path = self.write_xmltv(channels, cache, days)
+        print(
+            f"[EPG] Portal: {len(jobs)} channel-days requested, "
+            f"{counts['changed']} changed, {counts['unchanged']} unchanged, "
+            f"{counts['failed']} failed; guide saved to {output_path}."
+        )
+        return output_path
+
+    def fetch_day(self, channel_id: str, day: str, cached):
+        url = f"http://{self.scraper.epg_ip}:{self.scraper.epg_port}" + (
+            self.schedule_path.format(
+                channel_id=channel_id, date=day, user_id=self.scraper.user_id
+            )
+        )
+        headers = {"Cookie": f"JSESSIONID={self.scraper.jsession_id}"}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            r = self.scraper.session.get(url, headers=headers, timeout=self.timeout)
+            if r.status_code == 304 and cached:
+                return channel_id, day, cached, "unchanged"
+            r.raise_for_status()
+            text = r.content.decode(self.encoding)
+            digest = hashlib.sha1(r.content).hexdigest()
+            if cached and cached.get("digest") == digest:
+                return channel_id, day, cached, "unchanged"
+            entry = {
+                "digest": digest,
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+                "programmes": self.parse_schedule(text),
+            }
+            return channel_id, day, entry, "changed"
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"[EPG] Failed to fetch {channel_id} on {day}: {e}")
+            return channel_id, day, cached, "failed"
+
+    def parse_schedule(self, text: str) -> list:
+        data = json.loads(text)
+        for key in self.fields["list"].split(".") if self.fields["list"] else []:
+            data = data.get(key) or []
+        programmes = []
+        for item in data:
+            start = self._xmltv_time(item.get(self.fields["start"], ""))
+            stop = self._xmltv_time(item.get(self.fields["stop"], ""))
+            title = item.get(self.fields["title"], "")
+            if start and title:
+                programmes.append([start, stop, title])
+        return programmes
+
+    def _xmltv_time(self, value) -> str:
+        try:
+            t = datetime.strptime(str(value).strip(), self.fields["time_format"])
+        except ValueError:
+            return ""
+        return t.strftime("%Y%m%d%H%M%S") + " +0800"
+
+    def load_cache(self) -> dict:
+        try:
+            with open(self.cache_file_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_cache(self, cache: dict):
+        tmp_path = f"{self.cache_file_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_file_path)
+
+    def write_xmltv(self, channels: dict, cache: dict, days: list) -> Path:
+        output_path = Path(self.playlist_dir) / self.output_file_name
+        tmp_path = output_path.with_name(output_path.name + ".tmp")
+        opener = gzip.open if output_path.name.endswith(".gz") else open
+
+        with opener(tmp_path, "wb") as out:
+            out.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+            out.write(b'<tv generator-info-name="iptvTool">\n')
+            for tvg_name in channels:
+                channel = ET.Element("channel", id=tvg_name)
+                ET.SubElement(channel, "display-name").text = tvg_name
+                out.write(ET.tostring(channel, encoding="utf-8") + b"\n")
+            for tvg_name, channel_id in channels.items():
+                schedule = cache.get(channel_id, {})
+                for day in days:
+                    for start, stop, title in (schedule.get(day) or {}).get(
+                        "programmes", []
+                    ):
+                        attrs = {"start": start, "channel": tvg_name}
+                        if stop:
+                            attrs["stop"] = stop
+                        programme = ET.Element("programme", attrs)
+                        ET.SubElement(programme, "title").text = title
+                        out.write(ET.tostring(programme, encoding="utf-8") + b"\n")
+            out.write(b"</tv>\n")
+
+        os.replace(tmp_path, output_path)
+        return output_path
@@ -0,0 +1,141 @@
+import json, time, statistics, requests
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional
+from modules.channel import iter_channels
+from helpers.playlist import replace_third_ip_byte, set_url_query_param
+
+
+class FccSelector:
+    def __init__(
+        self, cfg: dict, common_config: dict, generator_config: dict, area_codes: dict
+    ):
+        self.area_codes = area_codes
+        self.data_dir = common_config.get("data_dir")
+        self.formatted_file_path = Path(self.data_dir) / common_config.get(
+            "formatted_file_name"
+        )
+        self.cache_file_path = Path(self.data_dir) / common_config.get(
+            "fcc_cache_file_name", "fcc_cache.json"
+        )
+        self.udpxy_base_url = generator_config.get("udpxy_base_url", "")
+        self.candidates = cfg.get("candidates", {})
+        self.sample_channels = cfg.get("sample_channels", [])
+        self.sample_size = cfg.get("sample_size", 3)
+        self.timeout = cfg.get("timeout", 3)
+        self.first_bytes = cfg.get("first_bytes", 188 * 7)
+        self.ttl_hours = cfg.get("ttl_hours", 24)
+        self.workers = cfg.get("workers", 8)
+        self.cache = self.load_cache()
+
+    def load_cache(self) -> dict:
+        try:
+            with open(self.cache_file_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save_cache(self):
+        with open(self.cache_file_path, "w", encoding="utf-8") as f:
+            json.dump(self.cache, f, ensure_ascii=False, indent=2)
+
+    def get(self, area: str) -> Optional[dict]:
+        return self.cache.get(area)
+
+    def is_fresh(self, area: str) -> bool:
+        entry = self.cache.get(area)
+        if not entry:
+            return False
+        return time.time() - entry.get("measured_at", 0) < self.ttl_hours * 3600
+
+    def run(self, areas: Optional[list] = None, force: bool = False):
+        areas = areas or [a for a in self.area_codes if self.candidates_for(a)]
+        samples = self.pick_samples()
+        if not samples:
+            print("[FCC] No sample channels with multicast addresses found.")
+            return
+
+        for area in areas:
+            if not force and self.is_fresh(area):
+                print(f"[FCC] {area}: cached result is still fresh, skipping.")
+                continue
+            candidates = self.candidates_for(area)
+            if not candidates:
+                print(f"[FCC] {area}: no candidates configured.")
+                continue
+            self.cache[area] = self.measure_area(area, candidates, samples)
+            self.save_cache()
+
+    def candidates_for(self, area: str) -> list[str]:
+        return self.candidates.get(area) or self.candidates.get("default", [])
+
+    def pick_samples(self) -> list[str]:
+        channels = [
+            ch for ch in iter_channels(self.formatted_file_path) if ch.mul_live
+        ]
+        if self.sample_channels:
+            wanted = set(self.sample_channels)
+            channels = [ch for ch in channels if ch.ChannelName in wanted]
+        return [ch.mul_live for ch in channels[: self.sample_size]]
+
+    def measure_area(self, area: str, candidates: list[str], samples: list[str]):
+        area_code = self.area_codes[area]
+        jobs = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for fcc in candidates:
+                base = set_url_query_param(self.udpxy_base_url, "fcc", fcc)
+                for mul_live in samples:
+                    path = replace_third_ip_byte(mul_live, area_code).replace(
+                        "rtp://", "rtp/"
+                    )
+                    jobs[executor.submit(self.probe, base.format(path))] = fcc
+
+            latencies = {fcc: [] for fcc in candidates}
+            failures = {fcc: 0 for fcc in candidates}
+            for fut in as_completed(jobs):
+                latency = fut.result()
+                if latency is None:
+                    failures[jobs[fut]] += 1
+                else:
+                    latencies[jobs[fut]].append(latency)
+
+        results = {}
+        for fcc in candidates:
+            total = len(latencies[fcc]) + failures[fcc]
+            results[fcc] = {
+                "success_rate": round(len(latencies[fcc]) / total, 3) if total else 0,
+                "latency_ms": (
+                    round(statistics.median(latencies[fcc]) * 1000, 1)
+                    if latencies[fcc]
+                    else None
+                ),
+            }
+
+        ranked = sorted(
+            (fcc for fcc in candidates if results[fcc]["success_rate"] > 0),
+            key=lambda f: (-results[f]["success_rate"], results[f]["latency_ms"]),
+        )
+        entry = {
+            "measured_at": int(time.time()),
+            "best": ranked[0] if ranked else None,
+            "fallback": ranked[1] if len(ranked) > 1 else None,
+            "results": results,
+        }
+        print(f"[FCC] {area}: best {entry['best']}, fallback {entry['fallback']}.")
+        return entry
+
+    def probe(self, url: str) -> Optional[float]:
+        start = time.monotonic()
+        try:
+            with requests.get(url, stream=True, timeout=self.timeout) as r:
+                r.raise_for_status()
+                received = 0
+                for chunk in r.iter_content(chunk_size=self.first_bytes):
+                    received += len(chunk)
+                    if received >= self.first_bytes:
+                        return time.monotonic() - start
+                    if time.monotonic() - start > self.timeout:
+                        break
+        except requests.exceptions.RequestException:
+            pass
+        return None
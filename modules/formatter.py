@@ -1,8 +1,15 @@
-import json, re
+import re, time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from tqdm import tqdm
 from typing import Optional
+from helpers.formatter import ChannelRules
+from modules.channel import Channel, load_channels, save_channels
+from modules.priority import ProbePriority, run_by_priority, now_str
+from modules.probes import ProbeRegistry
+from modules.health import HostHealthMap, url_host
+from helpers.postprocessor import test_ffmpeg_rtsp
+from utils.ffmpeg import get_redirected_rtsp_url
+from utils.ndjson import iter_records
 
 
 class Formatter:
@@ -13,27 +20,43 @@ class Formatter:
         self.formatted_file_name = common_config.get("formatted_file_name")
         self.input_file_path = Path(self.data_dir) / self.raw_file_name
         self.output_file_path = Path(self.data_dir) / self.formatted_file_name
+        self.formatted_file_format = common_config.get("formatted_file_format", "json")
         
         self.timeshift = cfg.get("timeshift")
-        self.group_title_map_by_channel_name_keywords = cfg.get(
-            "group_title_map_by_channel_name_keywords", {}
-        )
-        self.tvg_name_map_by_tvg_id = cfg.get("tvg_name_map_by_tvg_id", {})
-        self.tvg_name_map_by_tvg_name = cfg.get("tvg_name_map_by_tvg_name", {})
-        self.channel_name_map_by_tvg_id = cfg.get("channel_name_map_by_tvg_id", {})
+        self.rules = ChannelRules(cfg)
         self.workers = workers or cfg.get("workers", 10)
+        self.resolve_redirect = get_redirected_rtsp_url
+        self.test_stream = test_ffmpeg_rtsp
+        self.priority = ProbePriority(
+            common_config.get("sort_file_name"), cfg.get("process_channel_keywords")
+        )
+        self.probe_time_budget = cfg.get("probe_time_budget", 0)
+        self.probe_attempts = cfg.get("probe_attempts", 5)
+        self.balance_hosts = cfg.get("balance_hosts", False)
+        self.health = HostHealthMap(
+            common_config, min_success_rate=cfg.get("min_host_success_rate", 0.8)
+        )
+        self.probes = ProbeRegistry(common_config)
         self.results = []
         self.not_found = []
 
 
     def run(self):
         raw_data = self.load_raw()
+        self.probes.reset()
         self.process_all(raw_data)
+        self.check_edge_hosts()
+        self.probes.save()
+        self.probes.report()
         self.sort_results()
+        if self.balance_hosts:
+            self.health.assign(self.results)
+        self.health.save()
+        self.health.report()
         self.save_results()
         self.report_not_found()
 
-    def _process_channel(self, channel):
+    def _process_channel(self, channel, retries: int = 5):
         if "ChannelURL" not in channel or not channel["ChannelURL"].startswith(
             "igmp://"
         ):
@@ -42,41 +65,32 @@ class Formatter:
                 f"[Formatter] Channel '{channel.get('ChannelName', '?')}' does not have a ChannelURL. Skipping.",
             )
 
-        ChannelName = channel["ChannelName"]
         ChannelID = channel["ChannelID"]
         tvg_id = channel["UserChannelID"]
 
-        tvg_name = (
-            channel["ChannelName"]
-            .replace("超高清", "")
-            .replace("高清", "")
-            .replace("标清", "")
-            .replace(" ", "")
+        ChannelName, tvg_name, group_title = self.rules.apply(
+            channel["ChannelName"], tvg_id
         )
-        tvg_name = self.tvg_name_map_by_tvg_id.get(tvg_id, tvg_name)
-        tvg_name = self.tvg_name_map_by_tvg_name.get(tvg_name, tvg_name)
-
-        ChannelName = self.channel_name_map_by_tvg_id.get(tvg_id, ChannelName)
-
-        group_title = "其他频道"
-        for keyword, title in self.group_title_map_by_channel_name_keywords.items():
-            if keyword in ChannelName:
-                group_title = title
-                break
 
         mul_live = channel["ChannelURL"].replace("igmp://", "rtp://")
         uni_live = ""
         uni_playback = ""
         warnings = None
 
-        if "ChannelSDP" in channel:
+        if "ChannelSDP" in channel and retries:
             match = re.search(r"rtsp://\S+", channel["ChannelSDP"])
             if match:
                 tmp = match.group(0)
-                from utils.ffmpeg import get_redirected_rtsp_url
-
-                redirected = get_redirected_rtsp_url(tmp, retries=5, delay=1)
+                start = time.monotonic()
+                redirected = self.probes.probe(
+                    "redirect",
+                    tmp,
+                    lambda url: self.resolve_redirect(url, retries=retries, delay=1),
+                )
                 if redirected is not None:
+                    self.probes.record_host(
+                        url_host(redirected), True, time.monotonic() - start
+                    )
                     uni_live = redirected
                     pattern = r"(rtsp://\S+:\d+).*?(ch\d*)"
                     match2 = re.search(pattern, uni_live)
@@ -87,48 +101,113 @@ class Formatter:
                 else:
                     warnings = f"[Formatter] no accessible unicast address for channel: {ChannelName}"
 
-        record = {
-            "ChannelID": ChannelID,
-            "ChannelName": ChannelName,
-            "tvg_id": tvg_id,
-            "tvg_name": tvg_name,
-            "group_title": group_title,
-            "mul_live": mul_live,
-            "uni_live": uni_live,
-            "uni_playback": uni_playback,
-        }
+        record = Channel(
+            ChannelID=ChannelID,
+            ChannelName=ChannelName,
+            tvg_id=tvg_id,
+            tvg_name=tvg_name,
+            group_title=group_title,
+            mul_live=mul_live,
+            uni_live=uni_live,
+            uni_playback=uni_playback,
+        )
 
         return record, warnings
 
     def load_raw(self):
-        with open(self.input_file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return iter_records(self.input_file_path)
 
     def process_all(self, json_data):
+        jobs = []
+        for ch in json_data:
+            name, _, group_title = self.rules.apply(
+                ch.get("ChannelName", ""), ch.get("UserChannelID", "")
+            )
+            jobs.append((self.priority.rank(name, group_title), ch))
+        finished, unfinished = run_by_priority(
+            jobs,
+            self._probe_channel,
+            self.workers,
+            time_budget=self.probe_time_budget,
+            attempts=self.probe_attempts,
+            desc="[Formatter] Formatting raw data",
+        )
+        for _, (record, warning) in finished:
+            if record:
+                self.results.append(record)
+            if warning:
+                self.not_found.append(warning)
+        if unfinished:
+            self.keep_previous(unfinished)
+
+    def _probe_channel(self, channel, attempt: int):
+        if attempt > 1:
+            time.sleep(1)
+        record, warning = self._process_channel(channel, retries=1)
+        if record:
+            record.probed_at = {"format": now_str()}
+        return (record, warning), record is None or warning is None
+
+    def check_edge_hosts(self):
+        """
+        Stream-test one channel on every edge host the redirects returned and record
+        the outcome in the host health map. A failed redirect names no edge host, so
+        health only ever reflects the hosts channels are actually served from.
+        Tests go through self.test_stream, so in coordinator mode they run on workers.
+        """
+        samples = {}
+        for ch in self.results:
+            host = url_host(ch.uni_live)
+            if host and host not in samples:
+                samples[host] = ch.uni_live
+
+        def probe(host, url):
+            start = time.monotonic()
+            ok = self.probes.probe("stream", url, lambda u: self.test_stream(u))
+            self.health.record(host, ok, time.monotonic() - start)
+
         with ThreadPoolExecutor(max_workers=self.workers) as executor:
-            futures = {
-                executor.submit(self._process_channel, ch): ch for ch in json_data
-            }
-            for future in tqdm(
-                as_completed(futures),
-                total=len(futures),
-                desc="[Formatter] Formatting raw data",
-            ):
-                record, warning = future.result()
-                if record:
-                    self.results.append(record)
-                if warning:
-                    self.not_found.append(warning)
+            for fut in [executor.submit(probe, h, u) for h, u in samples.items()]:
+                fut.result()
+
+    def keep_previous(self, unfinished: list):
+        """Time budget ran out: reuse the last iptv.json entry of channels not probed."""
+        previous = {}
+        if self.output_file_path.exists():
+            previous = {ch.ChannelID: ch for ch in load_channels(self.output_file_path)}
+        kept = 0
+        for channel in unfinished:
+            record = previous.get(channel.get("ChannelID"))
+            if record is not None:
+                kept += 1
+            else:
+                record, _ = self._process_channel(channel, retries=0)
+                if record is None:
+                    continue
+                self.not_found.append(
+                    f"[Formatter] time budget exhausted before probing channel: {record.ChannelName}"
+                )
+            self.results.append(record)
+        print(
+            f"[Formatter] Time budget exhausted: {len(unfinished)} channels unfinished, "
+            f"{kept} kept their previous values."
+        )
 
     def sort_results(self):
         try:
-            self.results.sort(key=lambda x: int(x["tvg_id"]))
+            self.results.sort(key=lambda x: int(x.tvg_id))
         except ValueError:
-            self.results.sort(key=lambda x: x["tvg_id"])
+            self.results.sort(key=lambda x: x.tvg_id)
 
     def save_results(self):
-        with open(self.output_file_path, "w", encoding="utf-8") as f:
-            json.dump(self.results, f, ensure_ascii=False, indent=2)
+        if not save_channels(
+            self.output_file_path, self.results, fmt=self.formatted_file_format
+        ):
+            print(f"[Formatter] {self.output_file_path} is unchanged.")
+
+    def explain(self, channel_name: str, tvg_id: str = ""):
+        for line in self.rules.explain(channel_name, tvg_id):
+            print(f"[Formatter] {line}")
 
     def report_not_found(self):
         if self.not_found:
@@ -0,0 +1,95 @@
+import asyncio
+from pathlib import Path
+from modules.channel import iter_channels
+from modules.relay import FanoutServer, FanoutStream
+
+DEFAULT_UPSTREAM_COMMAND = [
+    "ffmpeg",
+    "-loglevel",
+    "error",
+    "-rtsp_transport",
+    "tcp",
+    "-i",
+    "{url}",
+    "-c",
+    "copy",
+    "-f",
+    "mpegts",
+    "-",
+]
+
+
+class RtspStream(FanoutStream):
+    log_prefix = "[Gateway]"
+
+    def __init__(self, server, key: str, url: str):
+        super().__init__(server, key)
+        self.url = url
+        self.process = None
+        self.pump_task = None
+
+    async def open(self):
+        cmd = [arg.replace("{url}", self.url) for arg in self.server.upstream_command]
+        self.process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        self.pump_task = asyncio.create_task(self._pump())
+        print(f"[Gateway] Opened upstream session for {self.key}.")
+
+    async def _pump(self):
+        stdout = self.process.stdout
+        while True:
+            data = await stdout.read(self.server.chunk_size)
+            if not data:
+                break
+            self.push(data)
+        await self.process.wait()
+        print(f"[Gateway] Upstream session for {self.key} ended.")
+        self.server.upstream_ended(self)
+
+    def close(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.kill()
+        print(f"[Gateway] Closed upstream session for {self.key}.")
+
+
+class RtspGateway(FanoutServer):
+    log_prefix = "[Gateway]"
+
+    def __init__(self, cfg: dict, common_config: dict):
+        super().__init__(cfg, default_port=5150)
+        self.upstream_command = cfg.get("upstream_command", DEFAULT_UPSTREAM_COMMAND)
+        self.chunk_size = cfg.get("chunk_size", 188 * 348)
+        self.idle_timeout = cfg.get("idle_timeout", 10)
+        self.formatted_file_path = Path(common_config.get("data_dir")) / common_config.get(
+            "formatted_file_name"
+        )
+        self.channels: dict[str, str] = {}
+        self._channels_mtime = None
+
+    def load_channels(self):
+        mtime = self.formatted_file_path.stat().st_mtime
+        if mtime == self._channels_mtime:
+            return
+        self.channels = {
+            ch.tvg_id: ch.uni_live
+            for ch in iter_channels(self.formatted_file_path)
+            if ch.uni_live
+        }
+        self._channels_mtime = mtime
+
+    def resolve(self, path: str):
+        if not path.startswith("/uni/"):
+            return None
+        tvg_id = path[len("/uni/") :]
+        try:
+            self.load_channels()
+        except FileNotFoundError:
+            return None
+        url = self.channels.get(tvg_id)
+        if not url:
+            return None
+        return tvg_id, lambda: RtspStream(self, tvg_id, url)
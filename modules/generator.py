@@ -2,6 +2,10 @@ import json, re
 from pathlib import Path
 from tqdm import tqdm
 from datetime import datetime, timedelta, timezone
+from modules.channel import Channel, iter_channels, load_channels
+from modules.health import HostHealthMap
+from modules.ordering import OrderIndex
+from utils.output import write_if_changed
 
 
 class M3UPlaylistGenerator:
@@ -14,9 +18,18 @@ class M3UPlaylistGenerator:
         self.formatted_file_name = common_config.get("formatted_file_name")
         self.formatted_file_path = Path(self.data_dir) / self.formatted_file_name
         self.sort_file_name = common_config.get("sort_file_name")
+        self.fcc_cache_file_path = Path(self.data_dir) / common_config.get(
+            "fcc_cache_file_name", "fcc_cache.json"
+        )
         self.url_tvg = cfg.get("url_tvg", False)
+        self.epg_base_url = cfg.get("epg_base_url", "")
         self.logo_base = cfg.get("logo_base", "")
         self.udpxy_base_url = cfg.get("udpxy_base_url", "")
+        self.gateway_base_url = cfg.get("gateway_base_url", "")
+        self.output_compress = cfg.get("output_compress", [])
+        self.health = HostHealthMap(common_config).load()
+        self.order_index = OrderIndex(self.formatted_file_path, self.sort_file_name)
+        self._channels = None
         self.exclude_channel_list_public = cfg.get("exclude_channel_list_public", [])
         self.exclude_channel_list_private = cfg.get("exclude_channel_list_private", [])
         self.channel_list_markdown_file_name = common_config.get(
@@ -24,21 +37,19 @@ class M3UPlaylistGenerator:
         )
 
     def generate_unused_multicast_m3u(self, area: str):
-        used = []
         noUse = []
         area_code = self.area_codes.get(area, "")
         if not area_code:
             raise ValueError("[Generator] 'area' not valid.")
 
-        with open(self.raw_file_path, "r", encoding="utf-8") as file:
-            data = json.load(file)
-            for channel in data:
-                url = channel["ChannelURL"].replace("igmp://", "")
-                matches = re.findall(r"\b(?:\d{1,3}\.){3}(\d{1,3})\b", url)
-                used.append(int(matches[0]))
-            for i in range(0, 256):
-                if i not in used:
-                    noUse.append(i)
+        used = {
+            ch.mul_addr & 0xFF
+            for ch in self.load_ordered_channels()
+            if ch.mul_addr is not None
+        }
+        for i in range(0, 256):
+            if i not in used:
+                noUse.append(i)
 
         unused_multicast_file_path = (
             Path(self.playlist_dir) / f"multicast-unused-{area}.m3u"
@@ -58,14 +69,13 @@ class M3UPlaylistGenerator:
         )
 
     def generate_channel_table(self):
-        with open(self.formatted_file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = self.load_ordered_channels()
 
         excluded_count = sum(
             1
             for channel_info in data
             if any(
-                channel_info.get("tvg_name", "") == channel
+                channel_info.tvg_name == channel
                 for channel in self.exclude_channel_list_public
             )
         )
@@ -84,34 +94,32 @@ class M3UPlaylistGenerator:
         ]
 
         for ch in data:
-            name = ch.get("ChannelName", "")
-            tvg_id = ch.get("tvg_id", "")
-            tvg_name = ch.get("tvg_name", "")
+            name = ch.ChannelName
+            tvg_id = ch.tvg_id
+            tvg_name = ch.tvg_name
 
             if any(
                 tvg_name.startswith(local) for local in self.exclude_channel_list_public
             ):
                 continue
 
-            channel_url = ch.get("mul_live", "")
-            mcast_number = ""
-            if channel_url.startswith("rtp://"):
-                import re
-
-                match = re.search(r"\.(\d+):\d+$", channel_url)
-                if match:
-                    mcast_number = match.group(1)
+            mcast_number = ch.mul_number
 
             lines.append(f"| {name} | {tvg_id} | {mcast_number} |")
 
-        with open(
-            Path(self.data_dir) / self.channel_list_markdown_file_name,
-            "w",
-            encoding="utf-8",
-        ) as f:
-            f.write("\n".join(lines))
+        path = Path(self.data_dir) / self.channel_list_markdown_file_name
+        text = "\n".join(lines)
+        if path.exists():
+            # Keep the previous timestamp when only the timestamp would change.
+            previous = path.read_text(encoding="utf-8")
+            match = re.search(r"\*\*更新时间\*\*: (.+?) UTC\+8", previous)
+            if match and text.replace(now_str, match.group(1), 1) == previous:
+                text = previous
 
-        print("[Generator] Channel list Markdown file has been generated.")
+        if write_if_changed(path, text):
+            print("[Generator] Channel list Markdown file has been generated.")
+        else:
+            print("[Generator] Channel list Markdown file is unchanged.")
 
     def generate_playlist(
         self, area: str = "", mode: str = "", filter: bool = False
@@ -120,102 +128,129 @@ class M3UPlaylistGenerator:
             raise ValueError(
                 "[Generator] 'area' and 'mode' must be provided and valid."
             )
-        channels = self.load_channels()
-        channels = self.sort_channels(channels)
+        channels = self.load_ordered_channels()
 
         area_code = self.area_codes.get(area, "")
         if not area_code:
             raise ValueError("[Generator] 'area' not valid.")
 
-        for playlist_type in ["uni", "mul"]:
+        variants = [("uni", self.udpxy_base_url, ""), ("mul", self.udpxy_base_url, "")]
+        fcc = self.load_fcc_selection().get(area) or {}
+        if fcc.get("best"):
+            variants[1] = ("mul", self.udpxy_base_url_with_fcc(fcc["best"]), "")
+        if fcc.get("fallback"):
+            variants.append(
+                ("mul", self.udpxy_base_url_with_fcc(fcc["fallback"]), "-fcc-fallback")
+            )
+
+        for playlist_type, udpxy_base_url, variant in variants:
             prefix = {"uni": "unicast", "mul": "multicast"}[playlist_type]
             infix = "-private" if mode == "private" else "-public"
             suffix = "-filtered" if filter else ""
-            output_file = f"{self.playlist_dir}/{prefix}{infix}{suffix}-{area}.m3u"
-
-            with Path(output_file).open("w", encoding="utf-8") as fp:
-                fp.write(f'#EXTM3U url-tvg="{self.url_tvg}" \n')
-
-                for ch in tqdm(
-                    channels,
-                    desc=f"[Generator] Processing {playlist_type} playlist",
-                    unit="channel",
-                ):
-                    if not self.filter_channel(ch, mode, filter):
-                        continue
-
-                    tvg_name = ch.get("tvg_name", "")
-                    tvg_logo = f"{self.logo_base}{tvg_name}.png"
-                    group_title = ch.get("group_title", "")
-                    catchup = ch.get("uni_playback")
-
-                    if playlist_type == "uni":
-                        url = ch.get("uni_live", "")
-                    else:
-                        from helpers.playlist import replace_third_ip_byte
+            output_file = (
+                f"{self.playlist_dir}/{prefix}{infix}{suffix}-{area}{variant}.m3u"
+            )
 
-                        url = f"{self.udpxy_base_url.format(replace_third_ip_byte(ch.get('mul_live', ''), area_code).replace('rtp://', 'rtp/'))}"
+            lines = [f'#EXTM3U url-tvg="{self.get_url_tvg(mode, filter)}" \n']
 
-                    if not url:
-                        continue
+            for ch in tqdm(
+                channels,
+                desc=f"[Generator] Processing {playlist_type} playlist",
+                unit="channel",
+            ):
+                if not self.filter_channel(ch, mode, filter):
+                    continue
+
+                ch = self.health.failover(ch)
+
+                tvg_name = ch.tvg_name
+                tvg_logo = f"{self.logo_base}{tvg_name}.png"
+                group_title = ch.group_title
+                catchup = ch.uni_playback
+                catchup_days = ch.catchup_days
+
+                if playlist_type == "uni":
+                    url = ch.uni_live
+                    if url and self.gateway_base_url:
+                        url = self.gateway_base_url.format(ch.tvg_id)
+                else:
+                    mul_path = ch.mul_path(area_code)
+                    url = udpxy_base_url.format(mul_path) if mul_path else ""
+
+                if not url:
+                    continue
+
+                extinf = (
+                    f"#EXTINF:-1 "
+                    f'tvg-name="{tvg_name}" '
+                    f'group-title="{group_title}" '
+                    f'tvg-logo="{tvg_logo}" '
+                )
 
-                    extinf = (
-                        f"#EXTINF:-1 "
-                        f'tvg-name="{tvg_name}" '
-                        f'group-title="{group_title}" '
-                        f'tvg-logo="{tvg_logo}" '
-                    )
+                if catchup:
+                    extinf += f'catchup="default" catchup-source="{catchup}"'
+                    if catchup_days:
+                        extinf += f' catchup-days="{catchup_days}"'
 
-                    if catchup:
-                        extinf += f'catchup="default" catchup-source="{catchup}"'
+                extinf += f", {tvg_name}"
+                lines.append(f"{extinf}\n{url}\n")
 
-                    extinf += f", {tvg_name}"
-                    fp.write(f"{extinf}\n{url}\n")
+            if write_if_changed(output_file, "".join(lines), self.output_compress):
+                print(
+                    f"[Generator] The {playlist_type} playlist has been saved to {output_file}."
+                )
+            else:
+                print(
+                    f"[Generator] The {playlist_type} playlist {output_file} is unchanged."
+                )
 
-            print(
-                f"[Generator] The {playlist_type} playlist has been saved to {output_file}."
-            )
+    def load_fcc_selection(self) -> dict:
+        try:
+            with open(self.fcc_cache_file_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def udpxy_base_url_with_fcc(self, fcc: str) -> str:
+        from helpers.playlist import set_url_query_param
+
+        return set_url_query_param(self.udpxy_base_url, "fcc", fcc)
+
+    def epg_file_name(self, mode: str, filter: bool) -> str:
+        infix = "-private" if mode == "private" else "-public"
+        suffix = "-filtered" if filter else ""
+        return f"epg{infix}{suffix}.xml.gz"
+
+    def get_url_tvg(self, mode: str, filter: bool) -> str:
+        file_name = self.epg_file_name(mode, filter)
+        if self.epg_base_url and (Path(self.playlist_dir) / file_name).exists():
+            return f"{self.epg_base_url}{file_name}"
+        return self.url_tvg
+
+    def generate_epg(self, slicer, mode: str = "", filter: bool = False) -> None:
+        if not mode:
+            raise ValueError("[Generator] 'mode' must be provided and valid.")
+        tvg_names = [
+            ch.tvg_name
+            for ch in iter_channels(self.formatted_file_path)
+            if self.filter_channel(ch, mode, filter)
+        ]
+        slicer.slice(tvg_names, self.epg_file_name(mode, filter))
 
-    def load_channels(self) -> list[dict]:
-        with Path(self.formatted_file_path).open("r", encoding="utf-8") as fp:
-            return json.load(fp)
+    def load_channels(self) -> list[Channel]:
+        if self._channels is None:
+            self._channels = load_channels(self.formatted_file_path)
+        return self._channels
 
-    def sort_channels(self, channels: list[dict]) -> list[dict]:
+    def load_ordered_channels(self) -> list[Channel]:
+        channels = self.load_channels()
         if not self.sort_file_name:
             return channels
+        return [channels[i] for i in self.order_index.order(channels)]
 
-        with Path(self.sort_file_name).open("r", encoding="utf-8") as fp:
-            order_list = [
-                line.strip()
-                for line in fp
-                if line.strip() and not line.strip().startswith("#")
-            ]
-
-        bucket: dict[str, list[dict]] = {}
-        for ch in channels:
-            bucket.setdefault(ch.get("ChannelName", ""), []).append(ch)
-
-        ordered_channels: list[dict] = []
-        remaining_channels: list[dict] = []
-
-        for tid in order_list:
-            ordered_channels.extend(bucket.pop(tid, []))
-
-        for remaining in bucket.values():
-            remaining_channels.extend(remaining)
-
-        high_channels = [
-            ch for ch in remaining_channels if "高清" in ch.get("ChannelName", "")
-        ]
-        low_channels = [
-            ch for ch in remaining_channels if "高清" not in ch.get("ChannelName", "")
-        ]
-
-        return ordered_channels + high_channels + low_channels
-
-    def filter_channel(self, ch: dict, mode: str, filter: bool) -> bool:
+    def filter_channel(self, ch: Channel, mode: str, filter: bool) -> bool:
 
-        ChannelName = ch.get("ChannelName", "")
+        ChannelName = ch.ChannelName
 
         if (
             filter == True
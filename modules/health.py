@@ -0,0 +1,136 @@
+import json, threading
+from pathlib import Path
+from urllib.parse import urlparse
+
+
+def url_host(url: str) -> str:
+    if not url:
+        return ""
+    return urlparse(url).hostname or ""
+
+
+def replace_host(url: str, old: str, new: str) -> str:
+    return url.replace(f"//{old}:", f"//{new}:", 1).replace(f"//{old}/", f"//{new}/", 1)
+
+
+def host_group(host: str, prefix_octets: int = 3) -> str:
+    """Hosts sharing the first prefix_octets octets serve the same channels."""
+    if prefix_octets <= 0:
+        return host
+    return ".".join(host.split(".")[:prefix_octets])
+
+
+class HostHealthMap:
+    def __init__(self, common_config: dict, min_success_rate: float = 0.8):
+        self.data_dir = common_config.get("data_dir")
+        self.file_path = Path(self.data_dir) / common_config.get(
+            "host_health_file_name", "host_health.json"
+        )
+        self.min_success_rate = min_success_rate
+        self.prefix_octets = common_config.get("equivalent_host_prefix_octets", 3)
+        self.hosts: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                self.hosts = json.load(f)
+        except FileNotFoundError:
+            self.hosts = {}
+        return self
+
+    def save(self):
+        with open(self.file_path, "w", encoding="utf-8") as f:
+            json.dump(self.hosts, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    def reset(self):
+        with self._lock:
+            for entry in self.hosts.values():
+                entry.update(success=0, failure=0, latency_ms=0.0, success_rate=0.0)
+
+    def record(self, host: str, ok: bool, latency: float):
+        if not host:
+            return
+        with self._lock:
+            entry = self.hosts.setdefault(
+                host,
+                {
+                    "success": 0,
+                    "failure": 0,
+                    "latency_ms": 0.0,
+                    "success_rate": 0.0,
+                    "channels": 0,
+                },
+            )
+            if ok:
+                n = entry["success"]
+                entry["latency_ms"] = round(
+                    (entry["latency_ms"] * n + latency * 1000) / (n + 1), 1
+                )
+                entry["success"] = n + 1
+            else:
+                entry["failure"] += 1
+            total = entry["success"] + entry["failure"]
+            entry["success_rate"] = round(entry["success"] / total, 3)
+
+    def is_healthy(self, host: str) -> bool:
+        entry = self.hosts.get(host)
+        if not entry:
+            return False
+        return entry["success"] > 0 and entry["success_rate"] >= self.min_success_rate
+
+    def equivalent_hosts(self, host: str) -> list[str]:
+        group = host_group(host, self.prefix_octets)
+        candidates = [
+            h
+            for h in self.hosts
+            if host_group(h, self.prefix_octets) == group and self.is_healthy(h)
+        ]
+        return sorted(candidates, key=lambda h: (self.hosts[h]["latency_ms"], h))
+
+    def assign(self, channels: list):
+        """Spread channels over healthy equivalent edge hosts, least loaded first."""
+        load: dict[str, int] = {}
+        for ch in channels:
+            host = url_host(ch.uni_live)
+            if not host:
+                continue
+            candidates = self.equivalent_hosts(host)
+            if not candidates:
+                continue
+            best = min(
+                candidates,
+                key=lambda h: (load.get(h, 0), self.hosts[h]["latency_ms"], h),
+            )
+            load[best] = load.get(best, 0) + 1
+            ch.uni_live = replace_host(ch.uni_live, host, best)
+            if ch.uni_playback:
+                ch.uni_playback = replace_host(ch.uni_playback, host, best)
+            ch.alternate_hosts = [h for h in candidates if h != best]
+
+        with self._lock:
+            for host, entry in self.hosts.items():
+                entry["channels"] = load.get(host, 0)
+
+    def failover(self, ch):
+        """Return the channel with its host swapped for a healthy alternate if needed."""
+        host = url_host(ch.uni_live)
+        if not host or host not in self.hosts or self.is_healthy(host):
+            return ch
+        for alternate in ch.alternate_hosts or []:
+            if self.is_healthy(alternate):
+                ch = ch.copy()
+                ch.uni_live = replace_host(ch.uni_live, host, alternate)
+                if ch.uni_playback:
+                    ch.uni_playback = replace_host(ch.uni_playback, host, alternate)
+                return ch
+        return ch
+
+    def report(self):
+        for host in sorted(self.hosts):
+            entry = self.hosts[host]
+            status = "ok" if self.is_healthy(host) else "degraded"
+            print(
+                f"- [Health] {host}: {status}, success {entry['success_rate']:.0%}, "
+                f"latency {entry['latency_ms']}ms, channels {entry['channels']}"
+            )
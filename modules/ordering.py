@@ -0,0 +1,131 @@
+import hashlib, json, os, re
+from pathlib import Path
+from typing import Optional
+
+# Bump when the rank computation changes so cached indexes are rebuilt.
+ORDER_VERSION = 1
+
+
+class SortRules:
+    """
+    Compiled config/channel_sort. One rule per line, earlier lines rank first:
+    - exact channel name (the original format)
+    - "re:<pattern>" matches ChannelName with re.search
+    - "@<group_title>" places every channel of that group at this line
+    Lines starting with "#" are comments. An exact name beats a pattern or group
+    rule; otherwise the earliest matching line wins.
+    """
+
+    def __init__(self, lines: list):
+        self.exact: dict[str, int] = {}
+        self.groups: dict[str, int] = {}
+        patterns = []
+        for i, line in enumerate(lines):
+            if line.startswith("re:"):
+                patterns.append((i, re.compile(line[3:])))
+            elif line.startswith("@"):
+                self.groups.setdefault(line[1:].strip(), i)
+            else:
+                self.exact.setdefault(line, i)
+        self.patterns = patterns
+        self.size = len(lines)
+
+    @classmethod
+    def from_file(cls, sort_file_name: Optional[str]) -> "SortRules":
+        return cls(read_sort_file(sort_file_name))
+
+    def match(self, channel_name: str, group_title: str = "") -> Optional[int]:
+        """Line index of the rule placing this channel, or None."""
+        if channel_name in self.exact:
+            return self.exact[channel_name]
+        best = self.groups.get(group_title)
+        for i, pattern in self.patterns:
+            if best is not None and i >= best:
+                break
+            if pattern.search(channel_name):
+                best = i
+                break
+        return best
+
+
+def read_sort_file(sort_file_name: Optional[str]) -> list:
+    if not sort_file_name:
+        return []
+    try:
+        with Path(sort_file_name).open("r", encoding="utf-8") as fp:
+            return [
+                line.strip()
+                for line in fp
+                if line.strip() and not line.strip().startswith("#")
+            ]
+    except FileNotFoundError:
+        return []
+
+
+def compute_ranks(rules: SortRules, channels: list) -> list:
+    """
+    One integer rank per channel: matched channels by rule line, then unmatched
+    "高清" channels, then the rest. Within a line, channels sharing a name stay
+    together in order of first appearance, then keep dataset order.
+    """
+    n = len(channels)
+    first_seen: dict[str, int] = {}
+    ranks = []
+    for i, ch in enumerate(channels):
+        first = first_seen.setdefault(ch.ChannelName, i)
+        line = rules.match(ch.ChannelName, ch.group_title)
+        if line is None:
+            line = rules.size if "高清" in ch.ChannelName else rules.size + 1
+        ranks.append((line * n + first) * n + i)
+    return ranks
+
+
+def _file_digest(path) -> str:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (FileNotFoundError, TypeError):
+        return ""
+
+
+class OrderIndex:
+    """
+    Channel ordering of iptv.json, cached next to it as <name>.order.json and
+    rebuilt only when iptv.json or the sort file changes.
+    """
+
+    def __init__(self, formatted_file_path, sort_file_name: Optional[str]):
+        self.formatted_file_path = Path(formatted_file_path)
+        self.sort_file_name = sort_file_name
+        self.file_path = self.formatted_file_path.with_name(
+            f"{self.formatted_file_path.stem}.order.json"
+        )
+
+    def digests(self) -> dict:
+        return {
+            "version": ORDER_VERSION,
+            "channels": _file_digest(self.formatted_file_path),
+            "sort": _file_digest(self.sort_file_name),
+        }
+
+    def order(self, channels: list) -> list:
+        """Dataset indexes of channels (as loaded from iptv.json) in playlist order."""
+        digests = self.digests()
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("digests") == digests and len(cached["order"]) == len(
+                channels
+            ):
+                return cached["order"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+
+        ranks = compute_ranks(SortRules.from_file(self.sort_file_name), channels)
+        order = sorted(range(len(channels)), key=ranks.__getitem__)
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"digests": digests, "order": order}, f)
+        os.replace(tmp_path, self.file_path)
+        print(f"[Ordering] Rebuilt channel order index {self.file_path}.")
+        return order
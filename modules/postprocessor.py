@@ -1,10 +1,15 @@
-import json
 from pathlib import Path
 from urllib.parse import urlparse
 from helpers.postprocessor import *
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional
 from datetime import datetime
+from modules.channel import iter_channels, save_channels
+from utils.ndjson import iter_records
+from modules.health import HostHealthMap, url_host, replace_host
+from modules.priority import ProbePriority, run_by_priority, now_str
+from modules.probes import ProbeRegistry
+from utils.ffmpeg import get_redirected_rtsp_url
 
 
 class PostProcessor:
@@ -13,39 +18,224 @@ class PostProcessor:
         self.data_dir = common_config.get("data_dir")
         self.formatted_file_name = common_config.get("formatted_file_name")
         self.formatted_file_path = Path(self.data_dir) / self.formatted_file_name
+        self.formatted_file_format = common_config.get("formatted_file_format", "json")
         self.raw_file_path = cfg.get("raw_file_path")
         self.channel_list_file_path = cfg.get("channel_list_file_path")
         self.process_channel_keywords = cfg.get("process_channel_keywords")
         self.channel_list_change_file_path = cfg.get("channel_list_change_file_path")
         self.workers = workers or cfg.get("workers", 10)
         self.playback_offset = cfg.get("playback_offset", 7)
+        self.catchup_max_days = cfg.get("catchup_max_days", 15)
         self.auth_test_channel_name = cfg.get("auth_test_channel_name", "")
+        self.auth_sample = cfg.get("auth_sample", "stratified")
+        self.auth_redirect_prefix = cfg.get("auth_redirect_prefix", "rtsp://222")
+        self.auth_probe_timeout = cfg.get("auth_probe_timeout", 2)
+        self.auth_time_budget = cfg.get("auth_time_budget", 5)
+        self.auth_min_samples = cfg.get("auth_min_samples", 3)
+        self.auth_unreachable_required = cfg.get("auth_unreachable_required", True)
+        self.probes = ProbeRegistry(common_config)
+        self.skip_dead_hosts = cfg.get("skip_dead_hosts", True)
+        self.probe_playback = self.probe_playback_hosts
+        self.priority = ProbePriority(
+            common_config.get("sort_file_name"), self.process_channel_keywords
+        )
+        self.probe_time_budget = cfg.get("probe_time_budget", 0)
+        self.probe_attempts = cfg.get("probe_attempts", 1)
+        self.resolve_redirect = get_redirected_rtsp_url
+        self.health = HostHealthMap(
+            common_config, min_success_rate=cfg.get("min_host_success_rate", 0.8)
+        )
+
+    def if_auth(self, sample: Optional[str] = None, rules=None) -> Optional[bool]:
+        import re, time
+        from concurrent.futures import wait, FIRST_COMPLETED
+
+        sample = sample or self.auth_sample
+        queue = self.auth_candidates(sample, rules)
+        total = len(queue)
+        if not queue:
+            print("[PostProcessor] No channels with an RTSP address to check.")
+            return None
+        needed = max(self.auth_min_samples, wilson_samples_needed())
+        print(f"[PostProcessor] Checking auth on up to {total} channels ({sample}).")
+
+        def probe(channel):
+            url = re.search(r"rtsp://\S+", channel["ChannelSDP"]).group(0)
+            start = time.monotonic()
+            redirected = self.resolve_redirect(
+                url, retries=1, timeout=self.auth_probe_timeout
+            )
+            latency = time.monotonic() - start
+            if not redirected:
+                status = "unreachable"
+            elif redirected.startswith(self.auth_redirect_prefix):
+                status = "auth_required"
+            else:
+                status = "open"
+            return channel, url_host(redirected or url), status, latency
+
+        results = []
+        required = decided = 0
+        verdict = None
+        deadline = time.monotonic() + self.auth_time_budget
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        initial = total if sample == "all" else needed
+        pending = {executor.submit(probe, ch) for ch in queue[:initial]}
+        queue = queue[initial:]
+        try:
+            while pending:
+                done, pending = wait(
+                    pending,
+                    timeout=max(deadline - time.monotonic(), 0),
+                    return_when=FIRST_COMPLETED,
+                )
+                if not done:
+                    break
+                for fut in done:
+                    channel, host, status, latency = fut.result()
+                    results.append((channel, host, status, latency))
+                    if status == "unreachable" and not self.auth_unreachable_required:
+                        continue  # not a vote either way
+                    decided += 1
+                    required += status != "open"
+                low, high = wilson_interval(required, decided)
+                if decided >= needed and (low > 0.5 or high < 0.5):
+                    verdict = low > 0.5
+                    break
+                if time.monotonic() > deadline:
+                    break
+                # no verdict from a full sample: keep it growing until the queue runs out
+                target = needed if decided < needed else decided + initial
+                while queue and decided + len(pending) < target:
+                    pending.add(executor.submit(probe, queue.pop(0)))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if verdict is None and decided and sample == "all":
+            verdict = required * 2 > decided
+
+        self.report_auth(results, total)
+        if verdict is None:
+            print("[PostProcessor] Auth requirement is inconclusive.")
+        elif verdict:
+            print("[PostProcessor] Authentication required.")
+        else:
+            print("[PostProcessor] No Authentication required.")
+        return verdict
+
+    def auth_candidates(self, sample: str, rules=None) -> list:
+        """
+        Channels to probe, in order. "stratified" puts one channel per group_title
+        and per edge host first, followed by the rest interleaved across groups,
+        so the sample can be topped up; "all" keeps raw order.
+        """
+        import re
+
+        channels = [
+            ch
+            for ch in iter_records(self.raw_file_path)
+            if re.search(r"rtsp://\S+", ch.get("ChannelSDP", ""))
+        ]
+        first = [
+            ch for ch in channels if ch.get("ChannelName") == self.auth_test_channel_name
+        ]
+        rest = [ch for ch in channels if ch not in first]
+        if sample == "all":
+            return first + rest
+
+        # group_title and edge host from the last format run; before format has
+        # run, groups come from the formatter rules and the SDP host stands in.
+        known = {}
+        if self.formatted_file_path.exists():
+            for ch in iter_channels(self.formatted_file_path):
+                known[ch.ChannelID] = (ch.group_title, url_host(ch.uni_live))
+
+        def strata(ch):
+            group, host = known.get(ch.get("ChannelID"), ("", ""))
+            if not group and rules is not None:
+                group = rules.apply(
+                    ch.get("ChannelName", ""), ch.get("UserChannelID", "")
+                )[2]
+            if not host:
+                host = url_host(re.search(r"rtsp://\S+", ch["ChannelSDP"]).group(0))
+            return group, host
+
+        seen_groups, seen_hosts = set(), set()
+        for ch in first:
+            group, host = strata(ch)
+            seen_groups.add(group)
+            seen_hosts.add(host)
+
+        picked, buckets = list(first), {}
+        for ch in rest:
+            group, host = strata(ch)
+            if group not in seen_groups or host not in seen_hosts:
+                picked.append(ch)
+                seen_groups.add(group)
+                seen_hosts.add(host)
+            else:
+                buckets.setdefault(group, []).append(ch)
+
+        extras = []
+        queues = list(buckets.values())
+        while queues:
+            extras.extend(q.pop(0) for q in queues)
+            queues = [q for q in queues if q]
+        return picked + extras
+
+    def report_auth(self, results: list, total: int):
+        hosts = {}
+        for channel, host, status, latency in sorted(
+            results, key=lambda r: r[0].get("ChannelName", "")
+        ):
+            print(
+                f"- [PostProcessor] {channel.get('ChannelName')}: {status} "
+                f"({latency * 1000:.0f}ms, {host})"
+            )
+            entry = hosts.setdefault(host, {})
+            entry.setdefault(status, []).append(latency)
+
+        for host, statuses in sorted(hosts.items()):
+            summary = ", ".join(
+                f"{status} {len(l)} (avg {sum(l) / len(l) * 1000:.0f}ms)"
+                for status, l in sorted(statuses.items())
+            )
+            print(f"- [PostProcessor] host {host}: {summary}")
+        print(f"[PostProcessor] Probed {len(results)} of {total} channels.")
+
+    def check_hosts(self):
+        import time
 
-    def if_auth(self):
-        with open(self.raw_file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            for channel in data:
-                if channel.get("ChannelName") == self.auth_test_channel_name:
-                    import re
+        self.health.load()
+        data = iter_channels(self.formatted_file_path)
 
-                    match = re.search(r"rtsp://\S+", channel["ChannelSDP"])
-                    if match:
-                        tmp = match.group(0)
-                        from utils.ffmpeg import get_redirected_rtsp_url
+        samples = {}
+        for ch in data:
+            url = ch.uni_live
+            for host in [url_host(url)] + (ch.alternate_hosts or []):
+                if host and host not in samples:
+                    samples[host] = replace_host(url, url_host(url), host)
 
-                        redirected = get_redirected_rtsp_url(tmp)
-                        if not redirected or redirected.startswith("rtsp://222"):
-                            print("[PostProcessor] Authentication required.")
-                        else:
-                            print("[PostProcessor] No Authentication required.")
+        def probe(host, url):
+            start = time.monotonic()
+            ok = test_ffmpeg_rtsp(url)
+            self.health.record(host, ok, time.monotonic() - start)
+
+        self.health.reset()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(probe, h, u) for h, u in samples.items()]
+            for fut in as_completed(futures):
+                fut.result()
+
+        self.health.save()
+        self.health.report()
 
     def diff(self):
         try:
-            with open(self.raw_file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
             json_channel_names = [
-                item["ChannelName"] for item in data if "ChannelName" in item
+                item["ChannelName"]
+                for item in iter_records(self.raw_file_path)
+                if "ChannelName" in item
             ]
 
 
@@ -96,27 +286,44 @@ class PostProcessor:
 
     def process_playback(self, offset: Optional[int] = None):
         offset = offset or self.playback_offset
-        results = []
         print("[PostProcessor] Starting to find playback URLs.")
-        with open(self.formatted_file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        self.probes.load()
+        jobs = [
+            (self.priority.rank(ch.ChannelName, ch.group_title), ch)
+            for ch in iter_channels(self.formatted_file_path)
+        ]
+
+        def work(channel, attempt):
+            # find_playback stamps a fresh probed_at dict only when it succeeds
+            before = channel.probed_at
+            self.find_playback(channel, offset)
+            ok = not self.should_probe(channel) or channel.probed_at is not before
+            return channel, ok
+
+        finished, unfinished = run_by_priority(
+            jobs,
+            work,
+            self.workers,
+            time_budget=self.probe_time_budget,
+            attempts=self.probe_attempts,
+        )
+        if unfinished:
+            print(
+                f"[PostProcessor] Time budget exhausted: {len(unfinished)} channels "
+                "keep their previous playback URLs."
+            )
 
-        with ThreadPoolExecutor(max_workers=self.workers) as executor:
-            futures = [executor.submit(self.find_playback, ch, offset) for ch in data]
-            for fut in as_completed(futures):
-                results.append(fut.result())
+        self.probes.save()
+        self.probes.report()
 
-        results = self.sort_results(results)
+        results = self.sort_results([ch for ch, _ in finished] + unfinished)
         self.save_results(self.formatted_file_path, results)
 
     def find_playback(self, channel, offset):
-        uni_playback = channel.get("uni_playback")
-        channel_name = channel.get("ChannelName")
+        uni_playback = channel.uni_playback
+        channel_name = channel.ChannelName
 
-        if not uni_playback or not channel_name:
-            return channel
-
-        if not any(ch in channel_name for ch in self.process_channel_keywords):
+        if not self.should_probe(channel):
             return channel
         from utils.convert import get_yyyyMMddHHmmss_with_offset
 
@@ -127,16 +334,20 @@ class PostProcessor:
             "{utcend:YmdHMS}", end_time
         )
 
-        if test_ffmpeg_rtsp(uni_playback_filled):
+        original_ok, success = self.probes.probe(
+            "playback",
+            uni_playback_filled,
+            self.probe_playback,
+            is_ok=lambda r: bool(r[0] or r[1]),
+            track_host=False,
+        )
+        if original_ok:
             print(
                 f"- [PostProcessor] Offset = {offset}: {channel_name}, Original URL is available, skipping."
             )
+            self.mark_probed(channel, "playback")
             return channel
 
-        success = test_ip_connectivity(
-            uni_playback_filled, 36, 48
-        ) or test_ip_connectivity(uni_playback_filled, 68, 74)
-
         if success:
             print(
                 f"- [PostProcessor] Offset = {offset}: {channel_name}, Playback URL fetched successfully."
@@ -146,19 +357,104 @@ class PostProcessor:
             ip_parts[-1] = str(success)
             new_ip = ".".join(ip_parts)
             new_url = uni_playback.replace(parsed.hostname, new_ip)
-            channel["uni_playback"] = new_url
+            channel.uni_playback = new_url
+            self.mark_probed(channel, "playback")
         else:
             print(f"- [PostProcessor] {channel_name} has no available playback URL.")
 
         return channel
 
+    def process_catchup_depth(self):
+        results = []
+        print("[PostProcessor] Starting to search catchup depth.")
+        data = iter_channels(self.formatted_file_path)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.find_catchup_depth, ch) for ch in data]
+            for fut in as_completed(futures):
+                results.append(fut.result())
+
+        results = self.sort_results(results)
+        self.save_results(self.formatted_file_path, results)
+
+    def find_catchup_depth(self, channel):
+        uni_playback = channel.uni_playback
+        channel_name = channel.ChannelName
+
+        if not self.should_probe(channel):
+            return channel
+        from utils.convert import get_yyyyMMddHHmmss_with_offset
+
+        def works(hours):
+            begin_time = get_yyyyMMddHHmmss_with_offset(hours=-hours)
+            end_time = get_yyyyMMddHHmmss_with_offset(hours=-hours + 1)
+            url = uni_playback.replace("{utc:YmdHMS}", begin_time).replace(
+                "{utcend:YmdHMS}", end_time
+            )
+            return test_ffmpeg_rtsp(url)
+
+        probes = 1
+        if not works(1):
+            print(f"- [PostProcessor] {channel_name} has no working catchup.")
+            channel.catchup_days = 0
+            channel.catchup_hours = 0
+            return channel
+
+        days, n = search_max_true(0, self.catchup_max_days, lambda d: works(d * 24))
+        probes += n
+        hours, n = search_max_true(
+            max(days * 24, 1), min(days * 24 + 23, self.catchup_max_days * 24), works
+        )
+        probes += n
+
+        # catchup-days is whole days: round up so a window under a day still shows.
+        channel.catchup_days = -(-hours // 24)
+        channel.catchup_hours = hours
+        self.mark_probed(channel, "catchup")
+        print(
+            f"- [PostProcessor] {channel_name}: catchup depth {hours}h ({probes} probes)."
+        )
+        return channel
+
+    def probe_playback_hosts(self, url: str):
+        """
+        Scan playback hosts, fastest known-alive first. A failed stream test only
+        means the host lacks this channel, so it never marks the host dead; only
+        hosts the format stage saw dead are skipped.
+        """
+        import time
+
+        def test(candidate):
+            start = time.monotonic()
+            ok = self.probes.probe(
+                "stream", candidate, test_ffmpeg_rtsp, track_host=False
+            )
+            if ok:
+                self.probes.record_host(
+                    url_host(candidate), True, time.monotonic() - start
+                )
+            return ok
+
+        order = self.probes.order_octets if self.skip_dead_hosts else None
+        return probe_playback_hosts(url, test=test, order=order)
+
+    def should_probe(self, channel) -> bool:
+        return bool(
+            channel.uni_playback
+            and channel.ChannelName
+            and any(ch in channel.ChannelName for ch in self.process_channel_keywords)
+        )
+
+    def mark_probed(self, channel, stage: str):
+        channel.probed_at = {**(channel.probed_at or {}), stage: now_str()}
+
     def sort_results(self, results):
         try:
-            results.sort(key=lambda x: int(x["tvg_id"]))
+            results.sort(key=lambda x: int(x.tvg_id))
         except ValueError:
-            results.sort(key=lambda x: x["tvg_id"])
+            results.sort(key=lambda x: x.tvg_id)
         return results
 
     def save_results(self, filename: str, results):
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        if not save_channels(filename, results, fmt=self.formatted_file_format):
+            print(f"[PostProcessor] {filename} is unchanged.")
@@ -0,0 +1,101 @@
+import itertools, queue, threading, time
+from datetime import datetime
+from typing import Callable, Optional
+from tqdm import tqdm
+from modules.ordering import SortRules
+
+
+def now_str() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class ProbePriority:
+    """Probe order: channels in the sort file, then keyword channels, then the rest."""
+
+    def __init__(self, sort_file_name: Optional[str], keywords: Optional[list] = None):
+        self.rules = SortRules.from_file(sort_file_name)
+        self.keywords = keywords or []
+
+    def rank(self, channel_name: str, group_title: str = "") -> tuple:
+        line = self.rules.match(channel_name, group_title)
+        if line is not None:
+            return (0, line)
+        for i, keyword in enumerate(self.keywords):
+            if keyword in channel_name:
+                return (1, i)
+        return (2, 0)
+
+
+def run_by_priority(
+    jobs: list,
+    work: Callable,
+    workers: int,
+    time_budget: float = 0,
+    attempts: int = 1,
+    desc: str = "",
+):
+    """
+    Run work(item, attempt) -> (result, ok) over (rank, item) jobs from one priority queue.
+
+    Lower ranks start first; a job that is not ok goes back into the queue with its
+    own rank, so failed high-priority jobs are retried before low-priority ones start.
+    Once time_budget seconds (0 = unlimited) have passed no new job is started.
+    An exception from work counts as a failed attempt; if the job still fails on its
+    last attempt, the first such exception is re-raised once all workers have stopped.
+    Returns (finished, unfinished): finished is a list of (item, result) in completion
+    order, unfinished the items never started or still waiting for a retry.
+    """
+    deadline = time.monotonic() + time_budget if time_budget else None
+    pending = queue.PriorityQueue()
+    seq = itertools.count()
+    for rank, item in jobs:
+        pending.put((rank, next(seq), 1, item))
+
+    finished = []
+    errors = []
+    lock = threading.Lock()
+    state = {"outstanding": len(jobs)}
+    progress = tqdm(total=len(jobs), desc=desc) if desc else None
+
+    def worker():
+        while True:
+            if deadline is not None and time.monotonic() > deadline:
+                return
+            with lock:
+                if state["outstanding"] == 0:
+                    return
+            try:
+                rank, order, attempt, item = pending.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            error = None
+            try:
+                result, ok = work(item, attempt)
+            except Exception as e:
+                error, result, ok = e, None, False
+            with lock:
+                if not ok and attempt < attempts:
+                    pending.put((rank, order, attempt + 1, item))
+                    continue
+                if error is not None:
+                    errors.append(error)
+                else:
+                    finished.append((item, result))
+                state["outstanding"] -= 1
+            if progress is not None:
+                progress.update()
+
+    threads = [threading.Thread(target=worker) for _ in range(max(workers, 1))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if progress is not None:
+        progress.close()
+    if errors:
+        raise errors[0]
+
+    unfinished = []
+    while not pending.empty():
+        unfinished.append(pending.get()[3])
+    return finished, unfinished
@@ -0,0 +1,154 @@
+import json, os, threading, time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable
+from modules.health import url_host
+
+
+class ProbeRegistry:
+    """
+    Probe outcomes of one run, shared by the format and post-processing stages.
+
+    Results are keyed by (kind, url); concurrent probes of the same key share one
+    request, and successful results are reused for max_age seconds.
+
+    Per-host alive/dead counts and latencies come from the format stage's
+    redirects (the edge host on success, the SDP front host on failure) and its
+    edge-host stream tests. A host is "dead" when every such probe of it in this
+    run failed. Playback stream tests only ever mark a host alive: a failure
+    there just means the host lacks that one channel.
+    """
+
+    def __init__(self, common_config: dict, max_age: float = 3600):
+        self.data_dir = common_config.get("data_dir")
+        self.file_path = Path(self.data_dir) / common_config.get(
+            "probe_registry_file_name", "probes.json"
+        )
+        self.max_age = max_age
+        self.urls: dict[str, dict] = {}
+        self.hosts: dict[str, dict] = {}
+        self.merged = 0
+        self._inflight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        cutoff = time.time() - self.max_age
+        self.urls = {k: v for k, v in data.get("urls", {}).items() if v["at"] >= cutoff}
+        self.hosts = {
+            k: v for k, v in data.get("hosts", {}).items() if v["at"] >= cutoff
+        }
+        return self
+
+    def save(self):
+        tmp_path = f"{self.file_path}.tmp"
+        with self._lock:
+            data = {"urls": self.urls, "hosts": self.hosts}
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.file_path)
+
+    def reset(self):
+        with self._lock:
+            self.urls = {}
+            self.hosts = {}
+            self.merged = 0
+        return self
+
+    def probe(
+        self,
+        kind: str,
+        url: str,
+        fn: Callable,
+        is_ok: Callable = bool,
+        track_host: bool = True,
+    ):
+        """Return fn(url), sharing the request with identical probes of this run."""
+        key = f"{kind} {url}"
+        with self._lock:
+            entry = self.urls.get(key)
+            if entry is not None and entry["ok"]:
+                self.merged += 1
+                return entry["result"]
+            pending = self._inflight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._inflight[key] = Future()
+            else:
+                self.merged += 1
+        if not owner:
+            return pending.result()
+
+        start = time.monotonic()
+        try:
+            result = fn(url)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            pending.set_exception(e)
+            raise
+        latency = time.monotonic() - start
+        ok = is_ok(result)
+
+        with self._lock:
+            del self._inflight[key]
+            self.urls[key] = {
+                "result": result,
+                "ok": ok,
+                "latency_ms": round(latency * 1000, 1),
+                "at": time.time(),
+            }
+        if track_host:
+            self.record_host(url_host(url), ok, latency)
+        pending.set_result(result)
+        return result
+
+    def record_host(self, host: str, ok: bool, latency: float):
+        if not host:
+            return
+        with self._lock:
+            entry = self.hosts.setdefault(
+                host, {"alive": 0, "dead": 0, "latency_ms": 0.0, "at": 0}
+            )
+            if ok:
+                n = entry["alive"]
+                entry["latency_ms"] = round(
+                    (entry["latency_ms"] * n + latency * 1000) / (n + 1), 1
+                )
+                entry["alive"] += 1
+            else:
+                entry["dead"] += 1
+            entry["at"] = time.time()
+
+    def host_status(self, host: str) -> str:
+        entry = self.hosts.get(host)
+        if entry is None:
+            return "unknown"
+        return "alive" if entry["alive"] else "dead"
+
+    def order_octets(self, url: str, octets: list) -> list:
+        """
+        Last octets to try for url's host: alive ones fastest first, then unseen
+        ones; octets of dead hosts are dropped.
+        """
+        prefix = url_host(url).rsplit(".", 1)[0]
+        alive, unknown = [], []
+        for octet in octets:
+            host = f"{prefix}.{octet}"
+            status = self.host_status(host)
+            if status == "alive":
+                alive.append((self.hosts[host]["latency_ms"], octet))
+            elif status == "unknown":
+                unknown.append(octet)
+        return [octet for _, octet in sorted(alive)] + unknown
+
+    def report(self):
+        alive = sum(1 for h in self.hosts if self.host_status(h) == "alive")
+        print(
+            f"[Probes] {len(self.urls)} URLs probed, {self.merged} duplicate probes "
+            f"merged, {alive} of {len(self.hosts)} hosts alive."
+        )
@@ -0,0 +1,359 @@
+import asyncio, json, socket, struct, time
+from typing import Optional
+
+
+def rtp_payload(data: bytes) -> memoryview:
+    """Strip the RTP header without copying; raw MPEG-TS passes through."""
+    view = memoryview(data)
+    if len(data) < 12 or data[0] == 0x47 or data[0] >> 6 != 2:
+        return view
+    offset = 12 + 4 * (data[0] & 0x0F)
+    if data[0] & 0x10 and len(data) >= offset + 4:
+        offset += 4 + 4 * struct.unpack_from("!H", data, offset + 2)[0]
+    if data[0] & 0x20 and len(data) > offset:
+        return view[offset : len(data) - data[-1]]
+    return view[offset:]
+
+
+class RingBuffer:
+    def __init__(self, size: int):
+        self.size = size
+        self.slots: list = [None] * size
+        self.seq = 0
+        self._waiter: Optional[asyncio.Future] = None
+
+    def push(self, item):
+        self.slots[self.seq % self.size] = item
+        self.seq += 1
+        self.wake()
+
+    def read(self, cursor: int) -> list:
+        start, end = cursor % self.size, self.seq % self.size
+        if self.seq - cursor >= self.size or end < start:
+            return self.slots[start:] + self.slots[:end]
+        return self.slots[start:end]
+
+    def wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def wait(self, cursor: int):
+        if cursor == self.seq:
+            if self._waiter is None or self._waiter.done():
+                self._waiter = asyncio.get_running_loop().create_future()
+            await self._waiter
+
+
+class StreamClient:
+    def __init__(self, writer: asyncio.StreamWriter, cursor: int):
+        self.writer = writer
+        self.cursor = cursor
+        self.peer = writer.get_extra_info("peername")
+        self.closed = False
+        self.reason = ""
+
+    def close(self, reason: str = ""):
+        if not self.closed:
+            self.closed = True
+            self.reason = reason
+            self.writer.close()
+
+
+class FanoutStream:
+    """One upstream source shared by any number of HTTP clients through a ring buffer."""
+
+    log_prefix = "[Relay]"
+
+    def __init__(self, server, key: str):
+        self.server = server
+        self.key = key
+        self.ring = RingBuffer(server.ring_size)
+        self.clients: set[StreamClient] = set()
+        self.idle_handle = None
+        self.stats = {
+            "packets": 0,
+            "bytes": 0,
+            "clients": 0,
+            "clients_total": 0,
+            "clients_dropped": 0,
+            "started": time.time(),
+        }
+
+    def push(self, data):
+        self.stats["packets"] += 1
+        self.stats["bytes"] += len(data)
+        self.ring.push(data)
+
+    async def open(self):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    async def serve(self, client: StreamClient):
+        ring = self.ring
+        try:
+            while not client.closed:
+                await ring.wait(client.cursor)
+                if client.closed or client.cursor == ring.seq:
+                    continue
+                if client.writer.transport.is_closing():
+                    client.close("disconnected")
+                    break
+                if ring.seq - client.cursor > ring.size:
+                    client.close("lagged")
+                    break
+                batch = ring.read(client.cursor)
+                client.cursor = ring.seq
+                client.writer.writelines(batch)
+                transport = client.writer.transport
+                if transport.get_write_buffer_size() > self.server.max_client_buffer:
+                    try:
+                        await asyncio.wait_for(
+                            client.writer.drain(), self.server.drain_timeout
+                        )
+                    except asyncio.TimeoutError:
+                        client.close("slow")
+        except (ConnectionError, OSError):
+            client.close("disconnected")
+
+    def end(self):
+        """Upstream finished: disconnect every client."""
+        for client in list(self.clients):
+            client.close("upstream")
+        self.ring.wake()
+
+
+class MulticastStream(FanoutStream, asyncio.DatagramProtocol):
+    def __init__(self, server, group: str, port: int):
+        super().__init__(server, f"{group}:{port}")
+        self.group = group
+        self.port = port
+        self.transport = None
+        self.stats["rtp_lost"] = 0
+        self._rtp_seq = None
+
+    async def open(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.server.recv_buffer)
+        sock.bind((self.group, self.port))
+        mreq = struct.pack(
+            "4s4s", socket.inet_aton(self.group), socket.inet_aton(self.server.interface)
+        )
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        sock.setblocking(False)
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: self, sock=sock)
+        print(f"[Relay] Joined {self.key}.")
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) >= 12 and data[0] >> 6 == 2:
+            seq = (data[2] << 8) | data[3]
+            if self._rtp_seq is not None:
+                self.stats["rtp_lost"] += (seq - self._rtp_seq - 1) & 0xFFFF
+            self._rtp_seq = seq
+        self.push(rtp_payload(data))
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+        print(f"[Relay] Left {self.key}.")
+
+
+class FanoutServer:
+    """Minimal HTTP front end mapping request paths to shared FanoutStreams."""
+
+    log_prefix = "[Relay]"
+
+    def __init__(self, cfg: dict, default_port: int):
+        self.host = cfg.get("host", "0.0.0.0")
+        self.port = cfg.get("port", default_port)
+        self.ring_size = cfg.get("ring_size", 2048)
+        self.max_client_buffer = cfg.get("max_client_buffer", 1024 * 1024)
+        self.drain_timeout = cfg.get("drain_timeout", 5)
+        self.idle_timeout = cfg.get("idle_timeout", 0)
+        self.streams: dict[str, FanoutStream] = {}
+        self._lock = None
+        self.server = None
+
+    async def start(self):
+        # created here, not in __init__: on Python 3.9 an asyncio.Lock binds to the
+        # loop current at construction, and main builds servers before asyncio.run
+        self._lock = asyncio.Lock()
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        print(f"{self.log_prefix} Listening on {self.host}:{self.port}.")
+        return self
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        for stream in list(self.streams.values()):
+            for client in list(stream.clients):
+                client.close("shutdown")
+            stream.ring.wake()
+            stream.close()
+        self.streams.clear()
+
+    def resolve(self, path: str):
+        """Return (key, factory) for a stream path, or None for 404."""
+        raise NotImplementedError
+
+    async def _respond(self, writer, status: bytes, body: bytes = b"", ctype=b""):
+        head = b"HTTP/1.1 " + status + b"\r\nConnection: close\r\n"
+        if ctype:
+            head += b"Content-Type: " + ctype + b"\r\n"
+        head += b"Content-Length: %d\r\n\r\n" % len(body)
+        writer.write(head + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+
+        parts = request.split(b"\r\n", 1)[0].decode("latin-1").split()
+        path = parts[1].split("?", 1)[0] if len(parts) >= 2 else ""
+
+        if path == "/status":
+            body = json.dumps(self.status(), indent=2).encode("utf-8")
+            await self._respond(writer, b"200 OK", body, b"application/json")
+            return
+
+        target = self.resolve(path)
+        if target is None:
+            await self._respond(writer, b"404 Not Found")
+            return
+
+        stream = await self._acquire(*target)
+        if stream is None:
+            await self._respond(writer, b"503 Service Unavailable")
+            return
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: video/mp2t\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        client = StreamClient(writer, stream.ring.seq)
+        stream.clients.add(client)
+        stream.stats["clients"] = len(stream.clients)
+        stream.stats["clients_total"] += 1
+        watcher = asyncio.create_task(self._watch_eof(reader, client, stream))
+        try:
+            await stream.serve(client)
+        finally:
+            watcher.cancel()
+            client.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+            if client.reason in ("lagged", "slow"):
+                stream.stats["clients_dropped"] += 1
+                print(
+                    f"{self.log_prefix} Dropped {client.reason} client "
+                    f"{client.peer} on {stream.key}."
+                )
+            await self._release(stream, client)
+
+    async def _watch_eof(self, reader, client: StreamClient, stream: FanoutStream):
+        """Notice a client hanging up even while the stream has nothing to send."""
+        try:
+            while await reader.read(4096):
+                pass
+        except (ConnectionError, OSError):
+            pass
+        client.close("disconnected")
+        stream.ring.wake()
+
+    async def _acquire(self, key: str, factory) -> Optional[FanoutStream]:
+        async with self._lock:
+            stream = self.streams.get(key)
+            if stream is not None and stream.idle_handle is not None:
+                stream.idle_handle.cancel()
+                stream.idle_handle = None
+            if stream is None:
+                stream = factory()
+                try:
+                    await stream.open()
+                except OSError as e:
+                    print(f"{self.log_prefix} Failed to open {key}: {e}")
+                    return None
+                self.streams[key] = stream
+            return stream
+
+    async def _release(self, stream: FanoutStream, client: StreamClient):
+        async with self._lock:
+            stream.clients.discard(client)
+            stream.stats["clients"] = len(stream.clients)
+            if not stream.clients and self.streams.get(stream.key) is stream:
+                self.on_idle(stream)
+
+    def on_idle(self, stream: FanoutStream):
+        if self.idle_timeout > 0:
+            loop = asyncio.get_running_loop()
+            stream.idle_handle = loop.call_later(
+                self.idle_timeout, self._teardown, stream
+            )
+        else:
+            self._teardown(stream)
+
+    def _teardown(self, stream: FanoutStream):
+        stream.idle_handle = None
+        if stream.clients or self.streams.get(stream.key) is not stream:
+            return
+        del self.streams[stream.key]
+        stream.close()
+
+    def upstream_ended(self, stream: FanoutStream):
+        if self.streams.get(stream.key) is stream:
+            del self.streams[stream.key]
+        stream.end()
+
+    def status(self) -> dict:
+        now = time.time()
+        result = {}
+        for key, stream in self.streams.items():
+            stats = dict(stream.stats)
+            stats["uptime"] = round(now - stats.pop("started"), 1)
+            stats["bitrate_kbps"] = round(
+                stats["bytes"] * 8 / 1000 / max(stats["uptime"], 1), 1
+            )
+            result[key] = stats
+        return result
+
+
+class MulticastRelay(FanoutServer):
+    def __init__(self, cfg: dict):
+        super().__init__(cfg, default_port=5140)
+        self.interface = cfg.get("interface", "0.0.0.0")
+        self.recv_buffer = cfg.get("recv_buffer", 4 * 1024 * 1024)
+
+    def resolve(self, path: str):
+        for prefix in ("/rtp/", "/udp/"):
+            if path.startswith(prefix):
+                try:
+                    group, port = path[len(prefix) :].rsplit(":", 1)
+                    socket.inet_aton(group)
+                    port = int(port)
+                except (ValueError, OSError):
+                    return None
+                return f"{group}:{port}", lambda: MulticastStream(self, group, port)
+        return None
@@ -1,5 +1,6 @@
-import re, random, json, requests
+import os, re, random, json, requests
 from pathlib import Path
+from utils.ndjson import NdjsonWriter
 
 
 class Scraper:
@@ -16,6 +17,7 @@ class Scraper:
         self.raw_file_name = common_config.get("raw_file_name")
 
         self.output_path = Path(self.data_dir) / self.raw_file_name
+        self.raw_file_format = common_config.get("raw_file_format", "json")
 
         self.stbIP = None
         self.encrypt_token = None
@@ -151,13 +153,12 @@ class Scraper:
             return
 
         text = r.content.decode("gbk")
-        channels = []
 
-        for line in text.splitlines():
-            match = re.search(r"jsSetConfig\('Channel',\s*'([^']+)'\)", line)
-            if match:
-                cfg = dict(re.findall(r"(\w+)=\"([^\"]+)\"", match.group(1)))
-                channels.append(cfg)
+        if self.raw_file_format == "ndjson":
+            self.stream_channels(text)
+            return
+
+        channels = list(self.parse_channels(text))
 
         if channels:
             try:
@@ -168,3 +169,28 @@ class Scraper:
                 print(f"[Scraper] Failed to write to file: {e}")
         else:
             print("[Scraper] No channels found in the fetched data.")
+
+    def parse_channels(self, text):
+        for line in text.splitlines():
+            match = re.search(r"jsSetConfig\('Channel',\s*'([^']+)'\)", line)
+            if match:
+                yield dict(re.findall(r"(\w+)=\"([^\"]+)\"", match.group(1)))
+
+    def stream_channels(self, text):
+        part_path = f"{self.output_path}.part"
+        count = 0
+        try:
+            with NdjsonWriter(part_path) as writer:
+                for cfg in self.parse_channels(text):
+                    writer.write(cfg)
+                    count += 1
+        except IOError as e:
+            print(f"[Scraper] Failed to write to file: {e}")
+            return
+
+        if count:
+            os.replace(part_path, self.output_path)
+            print(f"[Scraper] {count} channels fetched and saved successfully.")
+        else:
+            os.remove(part_path)
+            print("[Scraper] No channels found in the fetched data.")
@@ -0,0 +1,132 @@
+import multiprocessing, os, time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from modules.cluster import Coordinator, Worker
+
+TOKEN = "test-token"
+
+
+def double_probe(kind, payload):
+    return payload["n"] * 2
+
+
+def slow_probe(kind, payload):
+    with open(payload["log"], "a") as f:
+        f.write("run\n")
+    time.sleep(payload["sleep"])
+    return "slow done"
+
+
+def crashing_probe(kind, payload):
+    os._exit(1)
+
+
+PROBES = {"double": double_probe, "slow": slow_probe, "crash": crashing_probe}
+
+
+def _run_worker(url, name, probe, cfg):
+    Worker({"token": TOKEN, **cfg}, url=url, name=name, probe=PROBES[probe]).run(
+        max_failures=2
+    )
+
+
+@pytest.fixture
+def cluster():
+    ctx = multiprocessing.get_context("fork")
+    started = []
+
+    def start(coordinator_cfg, workers):
+        coord = Coordinator(
+            {"host": "127.0.0.1", "port": 0, "token": TOKEN, **coordinator_cfg}
+        ).start()
+        url = f"http://127.0.0.1:{coord.port}"
+        for name, probe in workers:
+            p = ctx.Process(
+                target=_run_worker,
+                args=(url, name, probe, {"poll_interval": 0.1, "worker_threads": 2}),
+            )
+            p.start()
+            started.append(p)
+        return coord
+
+    yield start
+    for p in started:
+        p.join(5)
+        if p.is_alive():
+            p.terminate()
+
+
+def test_tasks_spread_over_worker_processes(cluster):
+    coord = cluster({}, [("w1", "double"), ("w2", "double"), ("w3", "double")])
+    with ThreadPoolExecutor(max_workers=30) as executor:
+        results = list(
+            executor.map(lambda n: coord.call("x", {"n": n}, timeout=20), range(30))
+        )
+    coord.stop(grace=0.5)
+    assert results == [n * 2 for n in range(30)]
+    assert sum(s["done"] for s in coord.workers.values()) == 30
+    assert len(coord.workers) >= 2
+
+
+def test_long_task_keeps_its_lease(cluster, tmp_path):
+    log = tmp_path / "runs.log"
+    coord = cluster({"lease_seconds": 1}, [("w1", "slow")])
+    result = coord.call("x", {"log": str(log), "sleep": 3}, timeout=20)
+    coord.stop(grace=0.5)
+    assert result == "slow done"
+    assert log.read_text().count("run") == 1
+
+
+def test_task_of_crashed_worker_is_retried(cluster):
+    coord = cluster({"lease_seconds": 1}, [("crasher", "crash")])
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(coord.call, "x", {"n": 21}, 20)
+        time.sleep(1)
+        cluster_url = f"http://127.0.0.1:{coord.port}"
+        ctx = multiprocessing.get_context("fork")
+        healthy = ctx.Process(
+            target=_run_worker,
+            args=(cluster_url, "healthy", "double", {"poll_interval": 0.1}),
+        )
+        healthy.start()
+        result = future.result()
+    coord.stop(grace=0.5)
+    healthy.join(5)
+    assert result == 42
+    assert coord.workers["healthy"]["done"] == 1
+
+
+def test_call_times_out_without_workers(cluster):
+    coord = cluster({}, [])
+    start = time.monotonic()
+    assert coord.call("x", {"n": 1}, timeout=0.5) is None
+    assert time.monotonic() - start < 3
+    assert not coord.pending and not coord.tasks
+    coord.stop(grace=0)
+
+
+def test_redirect_payload_carries_retry_options(monkeypatch):
+    import utils.ffmpeg
+    from modules.cluster import run_probe
+
+    seen = {}
+
+    def fake_redirect(url, retries=5, delay=1, timeout=5):
+        seen.update(url=url, retries=retries, delay=delay, timeout=timeout)
+        return "rtsp://edge/x"
+
+    monkeypatch.setattr(utils.ffmpeg, "get_redirected_rtsp_url", fake_redirect)
+    payload = {"url": "rtsp://sdp/x", "retries": 1, "delay": 0, "timeout": 2}
+    assert run_probe("redirect", payload) == "rtsp://edge/x"
+    assert seen == {"url": "rtsp://sdp/x", "retries": 1, "delay": 0, "timeout": 2}
+
+
+def test_stream_task_runs_the_stream_test(monkeypatch):
+    import helpers.postprocessor
+    from modules.cluster import run_probe
+
+    monkeypatch.setattr(
+        helpers.postprocessor, "test_ffmpeg_rtsp", lambda url: url.endswith("/ok")
+    )
+    assert run_probe("stream", {"url": "rtsp://edge/ok"}) is True
+    assert run_probe("stream", {"url": "rtsp://edge/bad"}) is False
@@ -0,0 +1,129 @@
+import json, random
+from pathlib import Path
+import pytest
+from helpers.formatter import ChannelRules, KeywordAutomaton
+
+TEMPLATE = Path(__file__).resolve().parent.parent / "config-template" / "formatter_config.json"
+
+
+def _group(cfg, name):
+    return ChannelRules(cfg).apply(name, "")[2]
+
+
+def _first_match(keyword_map, name):
+    # group_title lookup as the formatter did it before the rules were compiled
+    for keyword, title in keyword_map.items():
+        if keyword in name:
+            return title
+    return "其他频道"
+
+
+def test_automaton_returns_smallest_key_across_overlaps():
+    automaton = KeywordAutomaton()
+    automaton.add("CCTV5+", (1, 0))
+    automaton.add("TV5", (0, 1))
+    automaton.add("CCTV", (2, 2))
+    automaton.build()
+    # "TV5" only ends inside "CCTV5+" and is reached through a failure link
+    assert automaton.search("CCTV5+体育") == (0, 1)
+    assert automaton.search("CCTV1") == (2, 2)
+    assert automaton.search("湖南卫视") is None
+
+
+def test_automaton_keeps_best_key_for_duplicate_keyword():
+    automaton = KeywordAutomaton()
+    automaton.add("卫视", (3, 0))
+    automaton.add("卫视", (1, 1))
+    automaton.build()
+    assert automaton.search("东方卫视") == (1, 1)
+
+
+@pytest.mark.parametrize(
+    "keywords, expected",
+    [
+        ({"CCTV": "央视频道", "CCTV5+": "体育频道"}, "央视频道"),
+        ({"CCTV5+": "体育频道", "CCTV": "央视频道"}, "体育频道"),
+    ],
+)
+def test_overlapping_keywords_follow_config_order(keywords, expected):
+    cfg = {"group_title_map_by_channel_name_keywords": keywords}
+    assert _group(cfg, "CCTV5+体育赛事") == expected
+    assert _group(cfg, "CCTV1综合") == "央视频道"
+
+
+def test_overlapping_keywords_follow_explicit_priority():
+    cfg = {
+        "group_title_rules": [
+            {"keyword": "CCTV", "group_title": "央视频道", "priority": 10},
+            {"keyword": "CCTV5+", "group_title": "体育频道", "priority": 1},
+        ]
+    }
+    assert _group(cfg, "CCTV5+体育赛事") == "体育频道"
+    assert _group(cfg, "CCTV5体育") == "央视频道"
+
+
+def test_equal_priority_ties_break_by_rule_order():
+    cfg = {
+        "group_title_rules": [
+            {"keyword": "CCTV5+", "group_title": "体育频道", "priority": 1},
+            {"keyword": "CCTV", "group_title": "央视频道", "priority": 1},
+        ]
+    }
+    assert _group(cfg, "CCTV5+") == "体育频道"
+    cfg["group_title_rules"].reverse()
+    assert _group(cfg, "CCTV5+") == "央视频道"
+
+
+def test_regex_rule_outranks_keyword():
+    cfg = {
+        "group_title_rules": [
+            {"regex": r"^CCTV\d+$", "group_title": "央视数字频道", "priority": 0}
+        ],
+        "group_title_map_by_channel_name_keywords": {"CCTV": "央视频道"},
+    }
+    assert _group(cfg, "CCTV13") == "央视数字频道"
+    assert _group(cfg, "CCTV5+") == "央视频道"
+
+
+def test_keyword_outranks_later_regex():
+    cfg = {
+        "group_title_rules": [
+            {"keyword": "卫视", "group_title": "卫视频道"},
+            {"regex": r"视", "group_title": "其他"},
+        ]
+    }
+    rules = ChannelRules(cfg)
+    assert rules.match_group("湖南卫视")["group_title"] == "卫视频道"
+    assert rules.match_group("电视剧")["group_title"] == "其他"
+    assert rules.match_group("新闻") is None
+    assert rules.apply("新闻", "")[2] == "其他频道"
+
+
+def test_keyword_map_matches_first_match_loop():
+    with open(TEMPLATE, "r", encoding="utf-8") as f:
+        keyword_map = json.load(f)["group_title_map_by_channel_name_keywords"]
+    rng = random.Random(0)
+    keyword_map = {
+        **keyword_map,
+        "CCTV5": "体育频道",
+        "5+": "加号频道",
+        "视": "单字频道",
+        "卫": "单字频道2",
+    }
+    rules = ChannelRules({"group_title_map_by_channel_name_keywords": keyword_map})
+    fragments = list(keyword_map) + ["高清", "+", "5", "湖南", "TV", "C", " ", "综合"]
+    for _ in range(2000):
+        name = "".join(rng.choice(fragments) for _ in range(rng.randint(0, 5)))
+        assert rules.apply(name, "")[2] == _first_match(keyword_map, name), name
+
+
+def test_normalize_matches_legacy_replace_chain():
+    rules = ChannelRules({})
+    for name in ["CCTV1 高清", "CCTV4K超高清", "湖南卫视标清", "CGTN 纪录"]:
+        legacy = (
+            name.replace("超高清", "")
+            .replace("高清", "")
+            .replace("标清", "")
+            .replace(" ", "")
+        )
+        assert rules.normalize(name) == legacy
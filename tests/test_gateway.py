@@ -0,0 +1,148 @@
+import asyncio, sys
+from modules.channel import Channel, save_channels
+from modules.gateway import RtspGateway
+
+# Stands in for ffmpeg: connects to the RTSP URL's host and port, asks for the
+# path and copies whatever the server sends to stdout until it hangs up.
+STAND_IN = """
+import socket, sys
+from urllib.parse import urlparse
+url = urlparse(sys.argv[1])
+sock = socket.create_connection((url.hostname, url.port))
+sock.sendall(("PLAY " + url.path + " RTSP/1.0\\r\\n\\r\\n").encode())
+while True:
+    data = sock.recv(65536)
+    if not data:
+        break
+    sys.stdout.buffer.write(data)
+    sys.stdout.buffer.flush()
+"""
+
+PACKET = b"\x47" + bytes(187)
+
+
+class FakeRtspServer:
+    """Accepts PLAY sessions and sends TS packets until told to stop."""
+
+    def __init__(self):
+        self.paths = []
+        self.open_sessions = 0
+        self.send = asyncio.Event()
+        self.finish = asyncio.Event()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def _handle(self, reader, writer):
+        request = await reader.readuntil(b"\r\n\r\n")
+        self.paths.append(request.split()[1].decode())
+        self.open_sessions += 1
+        try:
+            await self.send.wait()
+            writer.write(PACKET * 4)
+            await writer.drain()
+            done = asyncio.ensure_future(self.finish.wait())
+            eof = asyncio.ensure_future(reader.read())
+            await asyncio.wait([done, eof], return_when=asyncio.FIRST_COMPLETED)
+            done.cancel()
+            eof.cancel()
+        finally:
+            self.open_sessions -= 1
+            writer.close()
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+async def _start_gateway(tmp_path, rtsp_port, **cfg):
+    channels = [
+        Channel(
+            ChannelID="1",
+            ChannelName="CCTV1",
+            tvg_id="1",
+            tvg_name="CCTV1",
+            group_title="",
+            mul_live="rtp://239.0.0.1:5000",
+            uni_live=f"rtsp://127.0.0.1:{rtsp_port}/ch1",
+            uni_playback="",
+        )
+    ]
+    save_channels(tmp_path / "iptv.json", channels)
+    gateway = RtspGateway(
+        {
+            "host": "127.0.0.1",
+            "port": 0,
+            "upstream_command": [sys.executable, "-c", STAND_IN, "{url}"],
+            **cfg,
+        },
+        {"data_dir": tmp_path, "formatted_file_name": "iptv.json"},
+    )
+    return await gateway.start()
+
+
+async def _get(gateway, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", gateway.port)
+    writer.write(f"GET {path} HTTP/1.1\r\n\r\n".encode())
+    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+    return head, reader, writer
+
+
+async def _wait_for(condition, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        if loop.time() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+def test_gateway_shares_one_upstream_session(tmp_path):
+    async def scenario():
+        rtsp = await FakeRtspServer().start()
+        gateway = await _start_gateway(tmp_path, rtsp.port, idle_timeout=0)
+        try:
+            head, _, writer = await _get(gateway, "/uni/404")
+            assert head.startswith(b"HTTP/1.1 404")
+            writer.close()
+
+            clients = [await _get(gateway, "/uni/1") for _ in range(2)]
+            assert all(head.startswith(b"HTTP/1.1 200") for head, _, _ in clients)
+            assert await _wait_for(lambda: rtsp.open_sessions == 1)
+            assert rtsp.paths == ["/ch1"]
+
+            rtsp.send.set()
+            for _, reader, _ in clients:
+                data = await asyncio.wait_for(reader.readexactly(len(PACKET) * 4), 5)
+                assert data == PACKET * 4
+
+            for _, _, writer in clients:
+                writer.close()
+            assert await _wait_for(lambda: not gateway.streams)
+            assert await _wait_for(lambda: rtsp.open_sessions == 0)
+        finally:
+            await gateway.close()
+            await rtsp.close()
+
+    asyncio.run(scenario())
+
+
+def test_gateway_disconnects_clients_when_upstream_ends(tmp_path):
+    async def scenario():
+        rtsp = await FakeRtspServer().start()
+        gateway = await _start_gateway(tmp_path, rtsp.port)
+        try:
+            _, reader, _ = await _get(gateway, "/uni/1")
+            rtsp.send.set()
+            await asyncio.wait_for(reader.readexactly(len(PACKET) * 4), 5)
+            rtsp.finish.set()
+            assert await asyncio.wait_for(reader.read(), 5) == b""
+            assert not gateway.streams
+        finally:
+            await gateway.close()
+            await rtsp.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,66 @@
+from modules.channel import Channel
+from modules.formatter import Formatter
+from modules.health import HostHealthMap, host_group
+
+
+def _channel(name, host):
+    return Channel(
+        ChannelID=name,
+        ChannelName=name,
+        tvg_id=name,
+        tvg_name=name,
+        group_title="",
+        mul_live="rtp://239.0.0.1:5000",
+        uni_live=f"rtsp://{host}:554/{name}",
+        uni_playback="",
+    )
+
+
+def test_host_group_prefix():
+    assert host_group("10.0.1.5") == "10.0.1"
+    assert host_group("10.0.1.5", 2) == "10.0"
+    assert host_group("10.0.1.5", 0) == "10.0.1.5"
+
+
+def test_equivalent_hosts_follow_prefix_option(tmp_path):
+    for octets, expected in ((3, ["10.0.1.6"]), (2, ["10.0.1.6", "10.0.2.7"]), (0, [])):
+        health = HostHealthMap(
+            {"data_dir": tmp_path, "equivalent_host_prefix_octets": octets}
+        )
+        for host in ("10.0.1.5", "10.0.1.6", "10.0.2.7"):
+            health.record(host, host != "10.0.1.5", 0.01)
+        assert health.equivalent_hosts("10.0.1.5") == expected
+
+
+def test_formatter_health_only_charges_edge_hosts(tmp_path):
+    common_config = {
+        "data_dir": tmp_path,
+        "raw_file_name": "raw.json",
+        "formatted_file_name": "iptv.json",
+    }
+    formatter = Formatter(cfg={"workers": 2}, common_config=common_config)
+    formatter.resolve_redirect = lambda url, **kwargs: None
+    tested = []
+    formatter.test_stream = lambda url: tested.append(url) or "10.0.1.5" not in url
+    record, warning = formatter._process_channel(
+        {
+            "ChannelID": "1",
+            "UserChannelID": "1",
+            "ChannelName": "A",
+            "ChannelURL": "igmp://239.0.0.1:5000",
+            "ChannelSDP": "rtsp://10.9.9.9:554/sdp",
+        },
+        retries=1,
+    )
+    assert warning and formatter.health.hosts == {}
+
+    formatter.results = [
+        _channel("A", "10.0.1.5"),
+        _channel("B", "10.0.1.6"),
+        _channel("C", "10.0.1.6"),
+    ]
+    formatter.check_edge_hosts()
+    assert set(formatter.health.hosts) == {"10.0.1.5", "10.0.1.6"}
+    assert formatter.health.hosts["10.0.1.5"]["failure"] == 1
+    assert formatter.health.hosts["10.0.1.6"]["success"] == 1
+    assert sorted(tested) == ["rtsp://10.0.1.5:554/A", "rtsp://10.0.1.6:554/B"]
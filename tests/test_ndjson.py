@@ -0,0 +1,16 @@
+from utils.ndjson import iter_records, write_records
+
+
+def test_round_trip_both_layouts(tmp_path):
+    records = [{"ChannelName": "CCTV1"}, {"ChannelName": "卫视"}]
+    for ndjson in (False, True):
+        path = tmp_path / "raw.json"
+        write_records(path, records, ndjson=ndjson)
+        assert list(iter_records(path)) == records
+        assert not (tmp_path / "raw.json.tmp").exists()
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    path = tmp_path / "raw.json"
+    path.write_text('{"a": 1}\n{"a": 2}\n{"a":', encoding="utf-8")
+    assert list(iter_records(path)) == [{"a": 1}, {"a": 2}]
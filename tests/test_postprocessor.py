@@ -0,0 +1,129 @@
+import pytest
+import modules.postprocessor
+import utils.convert
+from modules.channel import Channel
+from modules.postprocessor import PostProcessor
+
+
+def _post_processor(**cfg):
+    return PostProcessor(
+        cfg={"process_channel_keywords": ["CCTV"], **cfg},
+        common_config={"data_dir": ".", "formatted_file_name": "iptv.json"},
+    )
+
+
+def _catchup(monkeypatch, depth_hours, max_days=15):
+    tested = []
+
+    def fake_test(url):
+        hours = int(url.rsplit("/", 1)[1].split("-")[0])
+        tested.append(hours)
+        return hours <= depth_hours
+
+    monkeypatch.setattr(
+        utils.convert, "get_yyyyMMddHHmmss_with_offset", lambda hours=0: str(-hours)
+    )
+    monkeypatch.setattr(modules.postprocessor, "test_ffmpeg_rtsp", fake_test)
+    channel = Channel(
+        ChannelID="1",
+        ChannelName="CCTV1",
+        tvg_id="1",
+        tvg_name="CCTV1",
+        group_title="",
+        mul_live="rtp://239.0.0.1:5000",
+        uni_live="rtsp://10.0.0.1:554/ch1",
+        uni_playback="rtsp://10.0.0.1:554/{utc:YmdHMS}-{utcend:YmdHMS}",
+    )
+    _post_processor(catchup_max_days=max_days).find_catchup_depth(channel)
+    return channel, tested
+
+
+@pytest.mark.parametrize(
+    "depth, days, hours",
+    [(0, 0, 0), (5, 1, 5), (24, 1, 24), (50, 3, 50), (72, 3, 72)],
+)
+def test_catchup_depth(monkeypatch, depth, days, hours):
+    channel, _ = _catchup(monkeypatch, depth)
+    assert (channel.catchup_days, channel.catchup_hours) == (days, hours)
+
+
+def test_catchup_search_stops_at_max_days(monkeypatch):
+    channel, tested = _catchup(monkeypatch, 10_000, max_days=3)
+    assert max(tested) == 72
+    assert (channel.catchup_days, channel.catchup_hours) == (3, 72)
+
+
+def test_playback_scan_does_not_skip_hosts_missing_other_channels(monkeypatch):
+    playback = {"ch1": "10.0.0.40", "ch2": "10.0.0.37"}
+    tested = []
+
+    def fake_test(url):
+        tested.append(url)
+        host, channel = url[len("rtsp://") :].split(":554/")
+        return playback[channel] == host
+
+    monkeypatch.setattr(modules.postprocessor, "test_ffmpeg_rtsp", fake_test)
+    post_processor = _post_processor()
+    post_processor.probes.record_host("10.0.0.38", False, 0.01)
+
+    assert post_processor.probe_playback_hosts("rtsp://10.0.0.41:554/ch1") == (
+        False,
+        40,
+    )
+    assert post_processor.probe_playback_hosts("rtsp://10.0.0.41:554/ch2") == (
+        False,
+        37,
+    )
+    # .40 is now known alive and tried first; .38 was seen dead by format.
+    assert tested[tested.index("rtsp://10.0.0.41:554/ch2") + 1].startswith(
+        "rtsp://10.0.0.40:"
+    )
+    assert not any(url.startswith("rtsp://10.0.0.38:") for url in tested)
+
+
+def _auth(tmp_path, redirects, **cfg):
+    import json
+
+    raw = [
+        {
+            "ChannelID": str(i),
+            "UserChannelID": str(i),
+            "ChannelName": f"Channel{i}",
+            "ChannelSDP": f"rtsp://10.0.{i}.1:554/ch{i}",
+        }
+        for i in range(len(redirects))
+    ]
+    raw_path = tmp_path / "raw.json"
+    raw_path.write_text(json.dumps(raw), encoding="utf-8")
+    post_processor = PostProcessor(
+        cfg={"raw_file_path": raw_path, "workers": 4, **cfg},
+        common_config={"data_dir": tmp_path, "formatted_file_name": "iptv.json"},
+    )
+    probed = []
+
+    def fake_redirect(url, **kwargs):
+        probed.append(url)
+        return redirects[int(url.rsplit("ch", 1)[1])]
+
+    post_processor.resolve_redirect = fake_redirect
+    return post_processor.if_auth("stratified"), probed
+
+
+def test_auth_survey_keeps_sampling_until_a_verdict(tmp_path):
+    redirects = ["rtsp://10.1.0.1/open"] + ["rtsp://222.0.0.1/auth"] * 11
+    verdict, probed = _auth(tmp_path, redirects)
+    assert verdict is True
+    assert 4 < len(probed) <= len(redirects)
+
+
+def test_auth_survey_decides_on_agreeing_votes(tmp_path):
+    verdict, probed = _auth(tmp_path, ["rtsp://10.1.0.1/open"] * 12)
+    assert verdict is False
+    assert len(probed) == 4
+
+
+def test_auth_survey_is_inconclusive_only_when_the_queue_runs_out(tmp_path):
+    redirects = ["rtsp://222.0.0.1/auth", "rtsp://10.1.0.1/open"] * 3
+    verdict, probed = _auth(tmp_path, redirects)
+    assert verdict is None
+    assert len(probed) == len(redirects)
@@ -0,0 +1,138 @@
+import asyncio, socket, struct
+import pytest
+from modules.relay import MulticastRelay, MulticastStream, RingBuffer, rtp_payload
+
+GROUP = "239.255.42.42"
+
+
+def _free_udp_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _sender() -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+    sock.setsockopt(
+        socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton("127.0.0.1")
+    )
+    return sock
+
+
+def _rtp(seq: int, payload: bytes) -> bytes:
+    return struct.pack("!BBHII", 0x80, 33, seq, 0, 0) + payload
+
+
+async def _start_relay(**cfg):
+    relay = MulticastRelay(
+        {"host": "127.0.0.1", "port": 0, "interface": "127.0.0.1", **cfg}
+    )
+    return await relay.start()
+
+
+async def _open_client(relay, port: int):
+    reader, writer = await asyncio.open_connection("127.0.0.1", relay.port)
+    writer.write(f"GET /rtp/{GROUP}:{port} HTTP/1.1\r\n\r\n".encode())
+    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+    assert head.startswith(b"HTTP/1.1 200")
+    return reader, writer
+
+
+async def _wait_for(condition, timeout=3.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        if loop.time() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+def test_rtp_payload_strips_header():
+    assert bytes(rtp_payload(_rtp(1, b"\x47abc"))) == b"\x47abc"
+    assert bytes(rtp_payload(b"\x47" + b"x" * 187)) == b"\x47" + b"x" * 187
+
+
+def test_ring_buffer_wraps():
+    ring = RingBuffer(4)
+    for i in range(6):
+        ring.push(i)
+    assert ring.read(3) == [3, 4, 5]
+
+
+def test_relay_fans_out_loopback_multicast():
+    async def scenario():
+        port = _free_udp_port()
+        relay = await _start_relay()
+        sender = _sender()
+        try:
+            clients = [await _open_client(relay, port) for _ in range(2)]
+            assert list(relay.streams) == [f"{GROUP}:{port}"]
+            stream = relay.streams[f"{GROUP}:{port}"]
+            payload = b"\x47" + bytes(187)
+            for seq in range(3):
+                sender.sendto(_rtp(seq, payload), (GROUP, port))
+            assert await _wait_for(lambda: stream.stats["packets"] == 3)
+            for reader, _ in clients:
+                data = await asyncio.wait_for(reader.readexactly(3 * 188), 5)
+                assert data == payload * 3
+            assert stream.stats["rtp_lost"] == 0
+            for _, writer in clients:
+                writer.close()
+        finally:
+            sender.close()
+            await relay.close()
+
+    try:
+        asyncio.run(scenario())
+    except OSError as e:
+        pytest.skip(f"loopback multicast unavailable: {e}")
+
+
+def test_relay_leaves_silent_group_when_client_hangs_up():
+    async def scenario():
+        port = _free_udp_port()
+        relay = await _start_relay(idle_timeout=0)
+        try:
+            _, writer = await _open_client(relay, port)
+            assert f"{GROUP}:{port}" in relay.streams
+            writer.close()
+            assert await _wait_for(lambda: not relay.streams)
+        finally:
+            await relay.close()
+
+    try:
+        asyncio.run(scenario())
+    except OSError as e:
+        pytest.skip(f"loopback multicast unavailable: {e}")
+
+
+def test_relay_built_outside_the_event_loop(monkeypatch):
+    # main.relay() constructs the server before asyncio.run(); concurrent
+    # requests must still be able to share the stream lock.
+    relay = MulticastRelay({"host": "127.0.0.1", "port": 0, "interface": "127.0.0.1"})
+    opened = []
+
+    async def slow_open(self):
+        opened.append(self.key)
+        await asyncio.sleep(0.1)
+
+    monkeypatch.setattr(MulticastStream, "open", slow_open)
+    monkeypatch.setattr(MulticastStream, "close", lambda self: None)
+
+    async def scenario():
+        await relay.start()
+        port = _free_udp_port()
+        try:
+            clients = await asyncio.gather(
+                *[_open_client(relay, port) for _ in range(3)]
+            )
+            assert opened == [f"{GROUP}:{port}"]
+            for _, writer in clients:
+                writer.close()
+        finally:
+            await relay.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,121 @@
+import json, os, random, string, tempfile, time, tracemalloc
+
+
+def _random_word(rng, alphabet, min_len, max_len):
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(min_len, max_len)))
+
+
+def bench_rules(n_rules=10_000, n_names=100_000, seed=0):
+    """
+    频道分组规则引擎基准测试：n_rules 条关键字规则 × n_names 个频道名称
+    与逐条 `keyword in name` 的线性扫描对比（线性扫描只抽样 1000 个名称）
+    """
+    from helpers.formatter import ChannelRules
+
+    rng = random.Random(seed)
+    alphabet = string.ascii_uppercase + string.digits + "卫视高清频道新闻体育少儿"
+    keywords = {}
+    while len(keywords) < n_rules:
+        keywords[_random_word(rng, alphabet, 3, 8)] = f"group{len(keywords) % 50}"
+    names = [_random_word(rng, alphabet, 4, 16) for _ in range(n_names)]
+
+    start = time.perf_counter()
+    rules = ChannelRules({"group_title_map_by_channel_name_keywords": keywords})
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matched = 0
+    for name in names:
+        if rules.match_group(name) is not None:
+            matched += 1
+    match_time = time.perf_counter() - start
+
+    sample = names[:1000]
+    start = time.perf_counter()
+    for name in sample:
+        for keyword in keywords:
+            if keyword in name:
+                break
+    linear_time = (time.perf_counter() - start) * len(names) / len(sample)
+
+    print(f"[Bench] rules={n_rules} names={n_names} matched={matched}")
+    print(f"[Bench] compile: {compile_time:.3f}s")
+    print(f"[Bench] compiled match: {match_time:.3f}s")
+    print(f"[Bench] linear scan (extrapolated): {linear_time:.3f}s")
+
+
+def bench_channels(n_channels=100_000, seed=0):
+    """
+    Channel 记录与 dict 的内存、序列化、反序列化对比
+    """
+    from modules.channel import Channel, load_channels, save_channels
+
+    rng = random.Random(seed)
+    groups = ["央视频道", "卫视频道", "其他频道"]
+
+    def make_dict(i):
+        return {
+            "ChannelID": f"ch{i % 3000:08d}",
+            "ChannelName": f"频道{i % 3000}高清",
+            "tvg_id": str(i % 3000),
+            "tvg_name": f"频道{i % 3000}",
+            "group_title": rng.choice(groups),
+            "mul_live": f"rtp://239.253.{rng.randint(0, 255)}.{i % 256}:8000",
+            "uni_live": f"rtsp://10.0.{i % 8}.{i % 250}:554/iptv/ch{i}Uni.sdp",
+            "uni_playback": f"rtsp://10.0.{i % 8}.{i % 250}:554/iptv/ch{i}.rsc",
+        }
+
+    raw = [json.loads(json.dumps(make_dict(i))) for i in range(n_channels)]
+
+    tracemalloc.start()
+    dicts = [dict(d) for d in json.loads(json.dumps(raw))]
+    dict_mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    channels = [Channel.from_dict(d) for d in json.loads(json.dumps(raw))]
+    channel_mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        classic_path = os.path.join(tmp, "classic.json")
+        compact_path = os.path.join(tmp, "compact.json")
+
+        start = time.perf_counter()
+        with open(classic_path, "w", encoding="utf-8") as f:
+            json.dump(dicts, f, ensure_ascii=False, indent=2)
+        dict_save = time.perf_counter() - start
+
+        start = time.perf_counter()
+        save_channels(compact_path, channels, fmt="compact")
+        compact_save = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(classic_path, "r", encoding="utf-8") as f:
+            json.load(f)
+        dict_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        load_channels(compact_path)
+        compact_load = time.perf_counter() - start
+
+        classic_size = os.path.getsize(classic_path)
+        compact_size = os.path.getsize(compact_path)
+
+    print(f"[Bench] channels={n_channels}")
+    print(
+        f"[Bench] memory: dict {dict_mem / 1e6:.1f}MB, "
+        f"Channel {channel_mem / 1e6:.1f}MB"
+    )
+    print(
+        f"[Bench] save: dict indent=2 {dict_save:.3f}s, "
+        f"Channel compact {compact_save:.3f}s"
+    )
+    print(
+        f"[Bench] load: dict {dict_load:.3f}s, "
+        f"Channel compact (incl. building records) {compact_load:.3f}s"
+    )
+    print(
+        f"[Bench] size: classic {classic_size / 1e6:.1f}MB, "
+        f"compact {compact_size / 1e6:.1f}MB"
+    )
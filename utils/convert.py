@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 
 def get_yyyyMMddHHmmss_with_offset(days=0, hours=0, minutes=0):
@@ -10,3 +10,21 @@ def get_yyyyMMddHHmmss_with_offset(days=0, hours=0, minutes=0):
     """
     target_time = datetime.now() + timedelta(days=days, hours=hours, minutes=minutes)
     return target_time.strftime("%Y%m%d%H%M%S")
+
+
+def parse_xmltv_time(value: str):
+    """
+    解析 XMLTV 时间，格式: yyyyMMddHHmmss +zzzz
+    未带时区时按 UTC+8 处理，无法解析返回 None
+    """
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        if " " in value:
+            return datetime.strptime(value, "%Y%m%d%H%M%S %z")
+        return datetime.strptime(value[:14], "%Y%m%d%H%M%S").replace(
+            tzinfo=timezone(timedelta(hours=8))
+        )
+    except ValueError:
+        return None
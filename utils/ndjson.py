@@ -0,0 +1,72 @@
+import json, os
+
+
+def iter_records(path):
+    """
+    逐条读取 JSON 记录，自动识别格式：
+    - 以 '[' 开头：整体 JSON 数组（原有格式）
+    - 其他：NDJSON，每行一个对象；末尾未写完的半行会被忽略
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        if head == "[":
+            f.seek(0)
+            yield from json.load(f)
+            return
+
+        f.seek(0)
+        for line in f:
+            if not line.strip():
+                continue
+            if not line.endswith("\n"):
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"[NDJSON] Ignoring truncated last line in {path}.")
+                return
+            yield json.loads(line)
+
+
+class NdjsonWriter:
+    """
+    逐条写入 NDJSON，每条记录一次 write 并 flush
+    只用于写临时文件（.part/.tmp），写完由调用方重命名；不支持向正在使用的文件续写
+    """
+
+    def __init__(self, path, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self.f = open(path, "w", encoding="utf-8")
+
+    def write(self, record):
+        self.f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.f.flush()
+        if self.fsync:
+            os.fsync(self.f.fileno())
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_records(path, records, ndjson: bool = False, indent: int = 2):
+    """
+    写入全部记录：ndjson=True 写 NDJSON，否则写原有的 JSON 数组格式
+    先写临时文件再重命名，避免中途崩溃留下残缺文件
+    """
+    tmp_path = f"{path}.tmp"
+    if ndjson:
+        with NdjsonWriter(tmp_path) as writer:
+            for record in records:
+                writer.write(record)
+    else:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(list(records), f, ensure_ascii=False, indent=indent)
+    os.replace(tmp_path, path)
@@ -0,0 +1,90 @@
+import gzip, hashlib, json, os
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST_FILE_NAME = "manifest.json"
+_warned = set()
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _file_digest(path: Path):
+    try:
+        with open(path, "rb") as f:
+            return _digest(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def _replace(path: Path, data: bytes):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _compressed(data: bytes, suffix: str):
+    if suffix == "gz":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if suffix == "br":
+        if brotli is None:
+            if not _warned:
+                print("[Output] 'brotli' not installed, skipping .br output.")
+                _warned.add(suffix)
+            return None
+        return brotli.compress(data)
+    raise ValueError(f"[Output] Unknown compression '{suffix}'.")
+
+
+def write_if_changed(path, data, compress=()) -> bool:
+    """
+    原子写入输出文件：内容与现有文件相同则不写
+    - data 为 str 时按 UTF-8 编码
+    - compress 可包含 "gz"、"br"，同时生成 .gz/.br 副本（内容不变时同样跳过）
+    - 同目录下的 manifest.json 记录每个产物的 sha256 与大小
+    返回主文件是否被改写
+    """
+    path = Path(path)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+
+    artifacts = {path: data}
+    for suffix in compress:
+        compressed = _compressed(data, suffix)
+        if compressed is not None:
+            artifacts[path.with_name(f"{path.name}.{suffix}")] = compressed
+
+    changed = set()
+    for artifact, content in artifacts.items():
+        if _file_digest(artifact) != _digest(content):
+            _replace(artifact, content)
+            changed.add(artifact)
+
+    update_manifest(path.parent, artifacts)
+    return path in changed
+
+
+def update_manifest(directory, artifacts: dict):
+    """
+    更新目录下 manifest.json 中的条目：{文件名: {"sha256": ..., "size": ...}}
+    """
+    manifest_path = Path(directory) / MANIFEST_FILE_NAME
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+
+    updated = dict(manifest)
+    for artifact, content in artifacts.items():
+        updated[Path(artifact).name] = {"sha256": _digest(content), "size": len(content)}
+
+    if updated != manifest:
+        text = json.dumps(dict(sorted(updated.items())), ensure_ascii=False, indent=2)
+        _replace(manifest_path, text.encode("utf-8"))